@@ -0,0 +1,31 @@
+"""
+Benchmark of coarse to fine generation. Compares generation time, fill and
+number of islands of single large tile for different refinement levels.
+Run from repository root: python -m benchmarks.bench_coarse_to_fine
+"""
+from time import perf_counter
+
+from src.generator import TileMapGenerator
+from src.map_statistics import MapStatistics
+from src.tile import Tile, TileTreeNode
+from src.tile_map import TileMap
+
+
+def run(size=600, fill=0.6, islands=3, levels=(0, 1, 2, 3)):
+    print(f"map {size}x{size}, fill {fill}, islands {islands}")
+    print("refinement  time s  fill   islands")
+    for refinement in levels:
+        tiles = TileTreeNode(Tile(0, '0', 'blue'), [
+            TileTreeNode(Tile(1, '1', 'green', fill, islands, refinement))])
+        tile_map = TileMap(size, size, tiles)
+        start = perf_counter()
+        TileMapGenerator(0).generate_map(tile_map)
+        elapsed = perf_counter() - start
+        raw_map = tile_map.get_map()
+        achieved = (raw_map == 1).mean()
+        count = MapStatistics.count_islands(raw_map, [1])
+        print(f"{refinement:10}  {elapsed:6.2f}  {achieved:.3f}  {count:7}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,49 @@
+"""
+Benchmark of cost model. Calibrates CostModel on current machine and
+compares estimated and measured generation time and peak memory (traced
+with tracemalloc in separate run) for several tile trees.
+Run from repository root: python -m benchmarks.bench_cost_model
+"""
+import tracemalloc
+from time import perf_counter
+
+from src.cost_model import CostModel
+from src.generator import TileMapGenerator
+from src.tile import Tile, TileTreeNode
+from src.tile_map import TileMap
+
+
+CASES = [(300, 0.5, 1, 0), (1000, 0.001, 100, 0), (400, 0.3, 20, 0),
+         (600, 0.5, 3, 2), (1000, 0.5, 3, 3)]
+
+
+def get_tiles(fill, islands, refinement):
+    return TileTreeNode(Tile(0, '0', 'blue'), [
+        TileTreeNode(Tile(1, '1', 'green', fill, islands, refinement), [
+            TileTreeNode(Tile(2, '2', 'gray', 0.2, 2))])])
+
+
+def run(cases=CASES):
+    model = CostModel()
+    print("calibration:", model.calibrate())
+    print("size  fill   islands refinement  time s  est s  peak MiB  est MiB")
+    for size, fill, islands, refinement in cases:
+        tiles = get_tiles(fill, islands, refinement)
+        estimate = model.estimate(tiles, size, size)
+        start = perf_counter()
+        TileMapGenerator(0).generate_map(TileMap(size, size, tiles))
+        elapsed = perf_counter() - start
+
+        tile_map = TileMap(size, size, tiles)
+        tracemalloc.start()
+        TileMapGenerator(0).generate_map(tile_map)
+        peak = tracemalloc.get_traced_memory()[1] + \
+            tile_map.get_map().nbytes
+        tracemalloc.stop()
+        print(f"{size:4}  {fill:5}  {islands:7} {refinement:10}  "
+              f"{elapsed:6.2f}  {estimate['seconds']:5.2f}  "
+              f"{peak / 2**20:8.1f}  {estimate['bytes'] / 2**20:7.1f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,49 @@
+"""
+Benchmark of polygon export. Maps of growing size hold the same islands,
+so boundary length stays fixed while area grows. Only finding boundary
+edges should grow with area, the rest of tracing and size of binary
+polygons should stay the same (compared with binary map of ids).
+Run from repository root: python -m benchmarks.bench_polygon_export
+"""
+from time import perf_counter
+
+import numpy as np
+
+from src.polygon_export import PolygonExport
+from src.tile import Tile, TileTreeNode
+from src.tile_map import TileMap
+from src.tile_map_io import TileMapIO
+
+
+def get_map(size, islands=200, island_size=30, random_seed=0):
+    random_generator = np.random.default_rng(random_seed)
+    raw_map = np.zeros((size, size), dtype=int)
+    for y, x in random_generator.integers(0, 1000 - island_size,
+                                          (islands, 2)):
+        raw_map[y:y + island_size, x:x + island_size] = 1
+        raw_map[y + 10:y + 15, x + 10:x + 15] = 2
+    return raw_map
+
+
+def run(sizes=(1000, 2000, 4000, 8000)):
+    tiles = TileTreeNode(Tile(0, '0', 'blue'), [
+        TileTreeNode(Tile(1, '1', 'green')), TileTreeNode(Tile(2, '2', 'red'))])
+    print("size  edges s  rest s  polygons  binary KiB  map KiB")
+    for size in sizes:
+        tile_map = TileMap(1, 1, tiles)
+        tile_map.update_map(get_map(size))
+        start = perf_counter()
+        PolygonExport.get_boundary_edges(tile_map.get_map())
+        edges = perf_counter() - start
+        export = PolygonExport(tile_map)
+        start = perf_counter()
+        polygons = export.get_polygons()
+        rest = perf_counter() - start - edges
+        binary = export.get_binary()
+        map_binary = TileMapIO.get_map_binary(tile_map.get_map())
+        print(f"{size:4}  {edges:7.3f}  {rest:6.3f}  {len(polygons):8}  "
+              f"{len(binary) / 1024:10.1f}  {len(map_binary) / 1024:7.0f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,69 @@
+"""
+Benchmark of generation workspace. Shows that number of allocated
+workspaces (padded map copies) and peak memory of generation do not depend
+on size of tile tree.
+Run from repository root: python -m benchmarks.bench_workspace [size]
+"""
+import sys
+import tracemalloc
+from time import perf_counter
+
+from src.generator import GenerationWorkspace, TileMapGenerator
+from src.tile import Tile, TileTreeNode
+from src.tile_map import TileMap
+
+
+def get_tree(depth, width=2, refinement=0):
+    """Returns tree with given depth where every node has width children"""
+    next_id = [1]
+
+    def build(level):
+        node_id = next_id[0]
+        next_id[0] += 1
+        node = TileTreeNode(
+            Tile(node_id, str(node_id), 'red', 0.6, 2, refinement))
+        if level < depth:
+            for i in range(width):
+                node.add_child(build(level + 1))
+        return node
+
+    root = TileTreeNode(Tile(0, '0', 'blue'))
+    root.add_child(build(1))
+    return root
+
+
+def count_workspaces():
+    """Wraps workspace constructor, returns list of created shapes"""
+    created = []
+    workspace_init = GenerationWorkspace.__init__
+
+    def counting_init(workspace, shape, *args, **kwargs):
+        created.append(tuple(shape))
+        workspace_init(workspace, shape, *args, **kwargs)
+
+    GenerationWorkspace.__init__ = counting_init
+    return created
+
+
+def run(size=150, depths=(1, 2, 3, 4)):
+    created = count_workspaces()
+    print(f"map {size}x{size}, map array {size*size*8/1024:.0f} KiB")
+    print("refinement  depth  tiles  workspaces  peak KiB  time s")
+    for refinement in (0, 1):
+        for depth in depths:
+            tiles = get_tree(depth, refinement=refinement)
+            n_tiles = len(tiles.get_names_list()) - 1
+            tile_map = TileMap(size, size, tiles)
+            created.clear()
+            tracemalloc.start()
+            start = perf_counter()
+            TileMapGenerator(0).generate_map(tile_map)
+            elapsed = perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{refinement:10}  {depth:5}  {n_tiles:5}  "
+                  f"{len(created):10}  {peak/1024:8.0f}  {elapsed:6.2f}")
+
+
+if __name__ == "__main__":
+    run(*[int(arg) for arg in sys.argv[1:2]])
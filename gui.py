@@ -6,9 +6,10 @@ import tkinter as tk
 from PIL import ImageTk
 
 from src.tile_map_io import TileMapIO
-from src.visualisation import TileMapVisualisation
+from src.visualisation import TileMapRenderCache
 from src.tile_map import TileMap
-from src.generator import TileMapGenerator
+from src.generator import BudgetExceededError, TileMapGenerator
+from src.preview import MapPreview
 from src.tile import Tile, TileTreeNode
 
 
@@ -72,6 +73,13 @@ class GenerationGUI(Frame):
     Main window of application
     """
 
+    # seconds of estimated generation time after which user is asked
+    TIME_BUDGET = 30
+    # milliseconds without changes after which preview is generated
+    PREVIEW_DELAY = 300
+    # size of longer side of preview image in pixels
+    PREVIEW_PIXELS = 400
+
     def __init__(self, root):
         Frame.__init__(self, root)
         self.root = root
@@ -102,10 +110,12 @@ class GenerationGUI(Frame):
         self.map_size_label.grid(row=0, column=0)
         self.x_map_size = Entry(self.map_size_frame, width=7)
         self.x_map_size.grid(row=0, column=1)
+        self.x_map_size.bind('<KeyRelease>', self.schedule_preview)
         self.map_size_x_label = Label(self.map_size_frame, text="x")
         self.map_size_x_label.grid(row=0, column=2)
         self.y_map_size = Entry(self.map_size_frame, width=7)
         self.y_map_size.grid(row=0, column=3)
+        self.y_map_size.bind('<KeyRelease>', self.schedule_preview)
         self.map_size_frame.grid(row=3, column=0, columnspan=3)
 
         self.generate_button = Button(
@@ -118,14 +128,25 @@ class GenerationGUI(Frame):
             self, text="View map", command=self.view_map)
         self.view_map_button.grid(row=4, column=2, padx=10, pady=10)
 
+        self.preview = MapPreview()
+        self.preview_label = Label(self)
+        self.preview_label.grid(row=5, column=0, columnspan=3, pady=10)
+        self.preview_image = None
+        self.preview_job = None
+
         # initializing map with sample tiles
         self.tiles = self.construct_ttn(self.tiles_info_list[0])
         self.map_ = TileMap(10, 10, self.tiles)
+        self.render_cache = None
 
     def view_map(self):
         if self.map_ is not None:
             self._map_window = Toplevel(self.root)
-            image = TileMapVisualisation.get_map_image(self.map_)
+            if self.render_cache is None or \
+                    self.render_cache.get_tile_map() is not self.map_:
+                self.render_cache = TileMapRenderCache(self.map_)
+            # copy, so that open windows don't change with next render
+            image = self.render_cache.get_map_image().copy()
             MapViewer(self._map_window, image).pack(
                 side="top", fill="both", expand=True)
 
@@ -156,11 +177,43 @@ class GenerationGUI(Frame):
             size_y = int(size_y)
             self.update_tiles()
             self.map_ = TileMap(size_y, size_x, self.tiles)
+            generator = TileMapGenerator(time_budget=self.TIME_BUDGET)
+            try:
+                generator.check_budget(self.map_)
+            except BudgetExceededError as e:
+                if not messagebox.askyesno(
+                        "Long generation", f"{e}. Generate anyway?"):
+                    return
             self.map_ = TileMapGenerator().generate_map(self.map_)
             self.view_map()
         except Exception as e:
             messagebox.showerror("Cannot generate map", str(e))
 
+    def schedule_preview(self, event=None):
+        """Generates preview after PREVIEW_DELAY, previous scheduled preview
+        is cancelled so that preview is generated once typing stops"""
+        if self.preview_job is not None:
+            self.after_cancel(self.preview_job)
+        self.preview_job = self.after(self.PREVIEW_DELAY, self.update_preview)
+
+    def update_preview(self):
+        """Generates and shows preview of current (also not saved) tiles
+        settings, invalid settings are skipped"""
+        self.preview_job = None
+        size_x = self.x_map_size.get()
+        size_y = self.y_map_size.get()
+        if not size_x.isdigit() or not size_y.isdigit() or \
+                int(size_x) < 1 or int(size_y) < 1:
+            return
+        tiles = self.construct_ttn(self.tiles_info_list[0], preview=True)
+        preview_map, complete = self.preview.generate(
+            tiles, int(size_y), int(size_x))
+        tile_size = max(1, self.PREVIEW_PIXELS //
+                        max(preview_map.get_map().shape))
+        image = TileMapRenderCache(preview_map, tile_size).get_map_image()
+        self.preview_image = ImageTk.PhotoImage(image)
+        self.preview_label.config(image=self.preview_image)
+
     def get_default_tiles_info(self):
         """Returns sample data"""
         return [RootTileInfoSegment(self.tile_info_container, self),
@@ -202,15 +255,20 @@ class GenerationGUI(Frame):
             self.tiles = self.map_.get_tiles()
             self.load_tiles_info_from_tiles()
             self.update_tiles_info()
+            self.schedule_preview()
         except Exception as e:
             messagebox.showerror("Couldn't load map", str(e))
 
-    def construct_ttn(self, first_tile):
-        """Constructs TileTreeNode from parsed tiles data"""
-        ttn = TileTreeNode(first_tile.construct_tile_object())
+    def construct_ttn(self, first_tile, preview=False):
+        """Constructs TileTreeNode from parsed tiles data, preview uses
+        values typed in fields even if they are not saved"""
+        if preview:
+            ttn = TileTreeNode(first_tile.construct_preview_tile_object())
+        else:
+            ttn = TileTreeNode(first_tile.construct_tile_object())
         for tile in self.tiles_info_list:
             if tile.parent_tile_id == first_tile.tile_id:
-                child_ttn = self.construct_ttn(tile)
+                child_ttn = self.construct_ttn(tile, preview)
                 ttn.add_child(child_ttn)
         return ttn
 
@@ -239,7 +297,8 @@ class GenerationGUI(Frame):
         return TileInfoSegment(
             self.tile_info_container, self, parent_id, tile_id=tile.get_id(),
             name=tile.get_name(), color=tile.get_color(), fill=tile.get_fill(),
-            islands=tile.get_islands(), level=level)
+            islands=tile.get_islands(), level=level,
+            refinement=tile.get_refinement())
 
 
 class TileInfoSegment(Frame):
@@ -248,7 +307,8 @@ class TileInfoSegment(Frame):
     """
 
     def __init__(self, root, main_gui, parent_tile_id, tile_id=0, name="name",
-                 color="#000000", fill=0.5, islands=1, level=0):
+                 color="#000000", fill=0.5, islands=1, level=0,
+                 refinement=0):
         Frame.__init__(self, root)
         self.main_gui = main_gui
         self.tile_id = tile_id
@@ -257,6 +317,7 @@ class TileInfoSegment(Frame):
         self.tile_color = color
         self.tile_fill = fill
         self.tile_islands = islands
+        self.tile_refinement = refinement
 
         self.indent_label = Label(self, text=level*"\t")
         self.indent_label.grid(row=0, column=0)
@@ -287,6 +348,8 @@ class TileInfoSegment(Frame):
         islands_text.set(self.tile_islands)
         self.islands_entry = Entry(self, width=2, textvariable=islands_text)
         self.islands_entry.grid(row=0, column=9)
+        for entry in (self.fill_entry, self.islands_entry):
+            entry.bind('<KeyRelease>', self.main_gui.schedule_preview)
 
         self.edit_mode = False
         self.set_edit_mode(self.edit_mode)
@@ -309,6 +372,7 @@ class TileInfoSegment(Frame):
         new_segment.enter_edit_mode()
         self.main_gui.insert_new_tile(new_segment, self.tile_id)
         self.main_gui.update_tiles_info()
+        self.main_gui.schedule_preview()
 
     def remove_tile(self):
         to_remove = self.find_children_tiles()
@@ -319,6 +383,7 @@ class TileInfoSegment(Frame):
             element.grid_forget()
 
         self.main_gui.update_tiles_info()
+        self.main_gui.schedule_preview()
 
     def find_children_tiles(self):
         if self.tile_id == 0:  # handling not saved tiles that have id of 0
@@ -362,6 +427,7 @@ class TileInfoSegment(Frame):
             self.save_button.grid_forget()
             self.edit_button.grid(row=0, column=10)
             self.add_button.config(state="normal")
+            self.main_gui.schedule_preview()
         except Exception as e:
             messagebox.showerror("Invalid tile data", str(e))
 
@@ -409,12 +475,27 @@ class TileInfoSegment(Frame):
         color = colorchooser.askcolor()
         self.color_button.config(bg=color[1])
         self.tile_color = color[1]
+        self.main_gui.schedule_preview()
 
     def construct_tile_object(self):
         tile = Tile(self.tile_id, self.tile_name, self.tile_color,
-                    self.tile_fill, self.tile_islands)
+                    self.tile_fill, self.tile_islands, self.tile_refinement)
         return tile
 
+    def construct_preview_tile_object(self):
+        """Returns tile with fill and islands typed in fields, saved values
+        are used if typed ones are not valid"""
+        fill, islands = self.tile_fill, self.tile_islands
+        try:
+            if 0 <= float(self.fill_entry.get()) <= 1:
+                fill = float(self.fill_entry.get())
+            if int(self.islands_entry.get()) >= 1:
+                islands = int(self.islands_entry.get())
+        except ValueError:
+            pass
+        return Tile(self.tile_id, self.tile_name, self.tile_color, fill,
+                    islands, self.tile_refinement)
+
     def check_if_uniqe_id(self, t_id):
         for existing_tile in self.main_gui.tiles_info_list:
             if existing_tile.tile_id == t_id and not existing_tile.edit_mode:
@@ -0,0 +1,152 @@
+from math import floor, sqrt
+from time import perf_counter
+
+
+class CostModel:
+    """
+    CostModel estimates time and peak memory of generating tile map before
+    generation starts, from map size and fill, islands and refinement of
+    every tile in tree. Time is sum of:
+    - growth steps, whose cost grows with island border length (square
+      root of island size),
+    - full map passes done for every island (masking, finding parent cells)
+      and every tile (copying map),
+    - boundary refinement of coarse to fine generation.
+    Sparse tiles don't pass over whole map, they only list parent cells
+    once and keep sets of cells they use.
+    Constants were measured with benchmarks/bench_cost_model.py and can be
+    measured again on current machine with calibrate.
+    :param calibration: Constants overriding DEFAULT_CALIBRATION
+    :type calibration: dict
+    """
+
+    DEFAULT_CALIBRATION = {
+        'step_seconds': 1.5e-5,  # single growth step
+        'border_seconds': 2e-7,  # step cost per square root of island size
+        'scan_seconds': 2e-8,  # map cell in pass done for every island
+        'tile_seconds': 5e-9,  # map cell in pass done for every tile
+        'refine_seconds': 1e-6,  # map cell in coarse to fine refinement
+        'regrow_seconds': 2e-5,  # regrown boundary cell
+        'map_bytes': 8,  # map cell of tile map
+        'workspace_bytes': 9,  # padded buffer and mask
+        'scan_bytes': 8,  # map cell of temporary masks
+        'parent_bytes': 16,  # coordinates of parent tile cell
+        'refine_bytes': 88,  # map cell of labels and region labelling
+        'border_bytes': 120,  # border tile kept in python list
+        'sparse_bytes': 200,  # cell of sparse tile (and its ring) in sets
+    }
+
+    def __init__(self, calibration=None):
+        self._calibration = dict(self.DEFAULT_CALIBRATION)
+        if calibration is not None:
+            self._calibration.update(calibration)
+
+    def get_calibration(self):
+        return dict(self._calibration)
+
+    def estimate(self, tiles, size_y, size_x):
+        """
+        Returns estimated cost of generating tile tree on map of size.
+        :return: Dictionary of estimated seconds, peak bytes and growth steps
+        :rtype: dict
+        """
+        c = self._calibration
+        area = size_y * size_x
+        seconds = 0
+        steps = 0
+        transient = 0
+        workspace = (size_y + 2) * (size_x + 2) * c['workspace_bytes']
+        nodes = [(tiles, area, False)]
+        while nodes:
+            node, parent_cells, sparse_parent = nodes.pop()
+            remaining = parent_cells
+            # sparse children are generated after dense ones
+            children = sorted(node.get_children(),
+                              key=lambda child: child.get_tile().is_sparse())
+            for child in children:
+                tile = child.get_tile()
+                cells = floor(remaining * tile.get_fill())
+                islands = max(tile.get_islands(), 1)
+                island_cells = cells / islands
+                sparse = sparse_parent or tile.is_sparse()
+                if sparse:
+                    steps += cells
+                    step = c['step_seconds'] + \
+                        c['border_seconds'] * sqrt(island_cells)
+                    seconds += cells * step
+                    tile_bytes = cells * c['sparse_bytes']
+                    if not sparse_parent:
+                        seconds += area * c['tile_seconds']
+                        tile_bytes += remaining * c['parent_bytes'] / 2
+                    transient = max(transient, tile_bytes)
+                    nodes.append((child, cells, True))
+                    remaining -= cells
+                    continue
+                block_cells = 4 ** tile.get_refinement()
+                if island_cells < block_cells:
+                    block_cells = 1  # islands generated on full map
+
+                tile_steps = cells / block_cells
+                steps += tile_steps
+                seconds += area * c['tile_seconds']
+                seconds += islands * area / block_cells * c['scan_seconds']
+                step = c['step_seconds'] + \
+                    c['border_seconds'] * sqrt(island_cells / block_cells)
+                seconds += tile_steps * step
+                tile_bytes = area * c['scan_bytes'] + \
+                    remaining * c['parent_bytes'] + \
+                    4 * sqrt(island_cells) * c['border_bytes']
+                if block_cells > 1:
+                    regrown = min(cells, islands * 4 * sqrt(island_cells) *
+                                  sqrt(block_cells))
+                    steps += regrown
+                    seconds += area * c['refine_seconds'] + \
+                        regrown * c['regrow_seconds']
+                    tile_bytes += area * c['refine_bytes']
+                transient = max(transient, tile_bytes)
+
+                nodes.append((child, cells, False))
+                remaining -= cells
+        return {'seconds': seconds,
+                'bytes': int(area * c['map_bytes'] + workspace + transient),
+                'steps': int(steps)}
+
+    def calibrate(self, size=200):
+        """Measures time constants by generating few maps of size on current
+        machine (takes about a second for default size) and returns them"""
+        # generator uses cost model, so it can't be imported at module level
+        from src.generator import TileMapGenerator
+        from src.tile import Tile, TileTreeNode
+        from src.tile_map import TileMap
+
+        def measure(size_y, fill, islands, refinement=0):
+            tiles = TileTreeNode(Tile(0, '0', 'blue'), [TileTreeNode(
+                Tile(1, '1', 'green', fill, islands, refinement))])
+            tile_map = TileMap(size_y, size, tiles)
+            start = perf_counter()
+            TileMapGenerator(0).generate_map(tile_map)
+            return perf_counter() - start, size_y * size
+
+        c = self._calibration
+        # many islands of single cell, time spent in full map passes
+        elapsed, area = measure(size, 1 / (size * size), 40)
+        c['scan_seconds'] = elapsed / (40 * area)
+        # growth of single island, step cost a + b * sqrt(n) fitted to
+        # two island sizes
+        costs = []
+        for size_y in (size // 4, size // 2):
+            elapsed, area = measure(size_y, 0.5, 1)
+            n = floor(area * 0.5)
+            costs.append((n, (elapsed - area * c['scan_seconds']) / n))
+        (n1, t1), (n2, t2) = costs
+        border = max((t2 - t1) / (sqrt(n2) - sqrt(n1)), 0)
+        c['border_seconds'] = border
+        c['step_seconds'] = max(t1 - border * sqrt(n1), 1e-7)
+        # remaining time of coarse to fine generation is refinement
+        c['refine_seconds'] = 0
+        elapsed, area = measure(size, 0.5, 1, 2)
+        rest = elapsed - self.estimate(TileTreeNode(Tile(0, '0', 'blue'), [
+            TileTreeNode(Tile(1, '1', 'green', 0.5, 1, 2))]),
+            size, size)['seconds']
+        c['refine_seconds'] = max(rest, 0) / area
+        return self.get_calibration()
@@ -0,0 +1,148 @@
+from weakref import WeakKeyDictionary
+
+import numpy as np
+
+from src.map_statistics import MapStatistics
+
+
+class DerivedLayers:
+    """
+    DerivedLayers computes arrays derived from tile map, such as distance
+    of every cell to nearest cell of id or to coast, and cells of one id
+    bordering other id. Layers are computed on first request and cached
+    until map revision changes (changes made in place have to be marked
+    with TileMap.mark_dirty). Returned arrays are read-only.
+    Distances are measured in steps between adjacent cells like in
+    BorderGeneration.get_adj_coords: Manhattan distance for 'sides' and
+    Chebyshev distance for 'all'. Cells are -1 if there is no source.
+    :param tile_map: Map of which layers are computed
+    :type tile_map: TileMap
+    """
+
+    _instances = WeakKeyDictionary()
+
+    def __init__(self, tile_map):
+        self._tile_map = tile_map
+        self._revision = None
+        self._layers = {}
+
+    @staticmethod
+    def get(tile_map):
+        """Returns layers of tile map shared by all callers"""
+        layers = DerivedLayers._instances.get(tile_map)
+        if layers is None:
+            layers = DerivedLayers(tile_map)
+            DerivedLayers._instances[tile_map] = layers
+        return layers
+
+    def get_distance_to_id(self, id_, mode='sides'):
+        """Returns distance of every cell to nearest cell of id"""
+        return self._get_layer(
+            ('distance', id_, mode),
+            lambda: self.get_distance(self._tile_map.get_map() == id_, mode))
+
+    def get_boundary_cells(self, id_a, id_b, mode='sides'):
+        """Returns boolean array of cells of id_a adjacent to cells of id_b"""
+        def compute():
+            raw_map = self._tile_map.get_map()
+            return self.get_adjacent(raw_map == id_a, raw_map == id_b, mode)
+        return self._get_layer(('boundary', id_a, id_b, mode), compute)
+
+    def get_coast_cells(self, mode='sides'):
+        """Returns boolean array of non background cells adjacent to
+        background cells"""
+        def compute():
+            raw_map = self._tile_map.get_map()
+            water = raw_map == self._tile_map.get_background_tile_id()
+            return self.get_adjacent(~water, water, mode)
+        return self._get_layer(
+            ('coast', self._tile_map.get_background_tile_id(), mode), compute)
+
+    def get_distance_to_coast(self, mode='sides'):
+        """Returns distance of every cell to nearest coast cell"""
+        return self._get_layer(
+            ('coast_distance', self._tile_map.get_background_tile_id(), mode),
+            lambda: self.get_distance(self.get_coast_cells(mode), mode))
+
+    def _get_layer(self, key, compute):
+        revision = self._tile_map.get_map_revision()
+        if revision != self._revision:
+            self._layers = {}
+            self._revision = revision
+        if key not in self._layers:
+            layer = compute()
+            layer.setflags(write=False)
+            self._layers[key] = layer
+        return self._layers[key]
+
+    @staticmethod
+    def get_adjacent(cells, neighbours, mode='sides'):
+        """Returns boolean array of cells having at least one neighbour"""
+        near = np.zeros_like(cells)
+        offsets = MapStatistics.SIDES
+        if mode == 'all':
+            offsets = MapStatistics.SIDES + MapStatistics.CORNERS
+        size_y, size_x = cells.shape
+        for dy, dx in offsets:
+            near[max(0, -dy):size_y - max(0, dy),
+                 max(0, -dx):size_x - max(0, dx)] |= \
+                neighbours[max(0, dy):size_y + min(0, dy),
+                           max(0, dx):size_x + min(0, dx)]
+        return cells & near
+
+    @staticmethod
+    def get_distance(sources, mode='sides'):
+        """Returns distance of every cell to nearest True cell of sources"""
+        if mode == 'sides':
+            return DerivedLayers.get_manhattan_distance(sources)
+        elif mode == 'all':
+            return DerivedLayers.get_chebyshev_distance(sources)
+        raise ValueError(f"Unknown distance mode {mode}")
+
+    @staticmethod
+    def get_manhattan_distance(sources):
+        """Manhattan distance is separable, so it is distance along rows
+        spread along columns. Both passes are vectorized min-plus
+        transforms: min(d[j] + |i - j|) is cumulative minimum of d[j] - j
+        plus i (and reversed for j > i)"""
+        sources = np.asarray(sources, dtype=bool)
+        infinity = sum(sources.shape) + 1
+        distance = np.where(sources, 0, infinity)
+        for axis in (1, 0):
+            distance = DerivedLayers._spread(distance, axis)
+        distance[distance >= infinity] = -1
+        return distance
+
+    @staticmethod
+    def _spread(distance, axis):
+        shape = [1, 1]
+        shape[axis] = distance.shape[axis]
+        steps = np.arange(distance.shape[axis]).reshape(shape)
+        forward = np.minimum.accumulate(distance - steps, axis=axis) + steps
+        backward = np.flip(np.minimum.accumulate(
+            np.flip(distance + steps, axis=axis), axis=axis), axis=axis) - \
+            steps
+        return np.minimum(forward, backward)
+
+    @staticmethod
+    def get_chebyshev_distance(sources):
+        """Chamfer transform with all neighbours at distance 1. Shortest
+        path can always be made of vertical and diagonal steps followed by
+        horizontal steps, so rows are passed down and up taking three
+        nearest cells of previous row, then distance is spread along rows
+        like in Manhattan distance"""
+        sources = np.asarray(sources, dtype=bool)
+        infinity = sum(sources.shape) + 1
+        distance = np.where(sources, 0, infinity)
+        size_y = distance.shape[0]
+        for rows in (range(1, size_y), range(size_y - 2, -1, -1)):
+            step = 1 if rows.step > 0 else -1
+            for y in rows:
+                previous = distance[y - step]
+                near = previous.copy()
+                np.minimum(near[1:], previous[:-1], out=near[1:])
+                np.minimum(near[:-1], previous[1:], out=near[:-1])
+                np.minimum(distance[y], near + 1, out=distance[y])
+        distance = DerivedLayers._spread(distance, 1)
+        distance[distance >= infinity] = -1
+        return distance
@@ -0,0 +1,270 @@
+from math import floor, sqrt
+from random import Random
+from time import perf_counter
+
+import numpy as np
+
+from src.generator import TileMapGenerator
+from src.map_statistics import MapStatistics
+from src.reference import ReferenceGenerator
+from src.tile import Tile, TileTreeNode
+from src.tile_map import TileMap
+
+
+class DifferentialFuzz:
+    """
+    DifferentialFuzz compares generation engine with ReferenceGenerator on
+    random tile trees and map sizes drawn from seed. Every case is
+    generated runs times by both engines (with the same seeds) and maps
+    of engine are checked for invariants:
+    - islands of tile never touch, also by corners (tile and tiles generated
+      on it have the same number of regions connected by sides and by all
+      neighbours) and there are no more of them than requested,
+    - tile has at most requested number of cells (floor of fill of cells
+      left of parent) plus one cell per island, as seed is placed even on
+      island of no cells,
+    - tiles are placed only on their parent id, cells of base map with ids
+      not in tree (obstacles) never change.
+    Engine is statistically close to reference if mean fill of every tile
+    (part of parent cells left for it) differs by at most fill_tolerance
+    plus FILL_ERRORS standard errors of difference of means and sizes of
+    islands (also relative to parent cells) don't differ at alpha
+    significance level (see get_island_p_value).
+    :param engine: Callable creating generator (with generate_map method)
+    from random seed, defaults to TileMapGenerator
+    :type engine: callable
+    :param reference: Callable creating reference generator, defaults to
+    ReferenceGenerator
+    :type reference: callable
+    :param random_seed: Seed of cases, defaults to 0
+    :type random_seed: int
+    :param runs: Number of maps generated for every case, defaults to 8
+    :type runs: int
+    :param fill_tolerance: Allowed difference of mean fill, defaults to 0.05
+    :type fill_tolerance: float
+    :param alpha: Significance level of island size test, defaults to 0.001
+    :type alpha: float
+    """
+
+    MIN_SIZE = 12
+    # reference is pure python, bigger maps take seconds per case
+    MAX_SIZE = 40
+    MAX_CHILDREN = 3
+    SPARSE_CHANCE = 0.25
+    OBSTACLE_CHANCE = 0.5
+    FILL_ERRORS = 4
+    PERMUTATIONS = 4999
+
+    def __init__(self, engine=TileMapGenerator, reference=ReferenceGenerator,
+                 random_seed=0, runs=8, fill_tolerance=0.05, alpha=0.001):
+        self._engine = engine
+        self._reference = reference
+        self._random = Random(random_seed)
+        self._runs = runs
+        self._fill_tolerance = fill_tolerance
+        self._alpha = alpha
+
+    def run(self, cases=10):
+        """Compares engines on number of random cases and returns list of
+        case reports (see run_case)"""
+        return [self.run_case(*self.get_case()) for i in range(cases)]
+
+    def get_case(self):
+        """Returns random tile tree and base map, which is filled with root
+        id except for optional rectangle of obstacle id"""
+        ids = iter(range(1, 100))
+        colors = ['green', 'gray', 'yellow', 'brown', 'red', 'orange']
+
+        def get_tile(sparse):
+            id_ = next(ids)
+            color = colors[id_ % len(colors)]
+            if sparse:
+                return Tile(id_, str(id_), color,
+                            round(self._random.uniform(0.01, 0.05), 3),
+                            self._random.randint(1, 6), sparse=True)
+            return Tile(id_, str(id_), color,
+                        round(self._random.uniform(0.1, 0.6), 2),
+                        self._random.randint(1, 4),
+                        self._random.randint(0, 2))
+
+        def get_children(depth):
+            children = []
+            for i in range(self._random.randint(1, self.MAX_CHILDREN)):
+                sparse = self._random.random() < self.SPARSE_CHANCE
+                grandchildren = []
+                if not sparse and depth > 1 and self._random.random() < 0.5:
+                    grandchildren = get_children(depth - 1)
+                children.append(TileTreeNode(get_tile(sparse),
+                                             grandchildren))
+            # engines generate sparse tiles after dense ones
+            return sorted(children,
+                          key=lambda child: child.get_tile().is_sparse())
+
+        tiles = TileTreeNode(Tile(0, '0', 'blue'), get_children(2))
+        size_y = self._random.randint(self.MIN_SIZE, self.MAX_SIZE)
+        size_x = self._random.randint(self.MIN_SIZE, self.MAX_SIZE)
+        base_map = np.zeros((size_y, size_x), dtype=int)
+        if self._random.random() < self.OBSTACLE_CHANCE:
+            y0 = self._random.randrange(size_y)
+            x0 = self._random.randrange(size_x)
+            base_map[y0:y0 + size_y // 2, x0:x0 + size_x // 2] = next(ids)
+        return tiles, base_map
+
+    def run_case(self, tiles, base_map):
+        """
+        Generates case with both engines and compares them.
+        :return: Report with shape of map, seconds taken by both engines,
+        speedup of engine, largest fill difference and smallest island size
+        p-value of tiles and list of failures
+        :rtype: dict
+        """
+        seeds = [self._random.randrange(2**32) for i in range(self._runs)]
+        failures = []
+        measures = {}
+        seconds = {}
+        for name, engine in (('reference', self._reference),
+                             ('engine', self._engine)):
+            seconds[name] = 0
+            measures[name] = []
+            for seed in seeds:
+                tile_map = TileMap(1, 1, tiles)
+                tile_map.update_map(base_map.copy())
+                start = perf_counter()
+                engine(seed).generate_map(tile_map)
+                seconds[name] += perf_counter() - start
+                raw_map = tile_map.get_merged_map()
+                failures += [f"{name} (seed {seed}): {violation}"
+                             for violation in self.check_invariants(
+                                 base_map, raw_map, tiles)]
+                measures[name].append(self.get_tile_measures(raw_map, tiles))
+
+        fill_difference = 0
+        island_p_value = 1.0
+        for id_ in measures['reference'][0]:
+            fills = {}
+            variance = 0
+            sizes = {}
+            for name in measures:
+                run_fills = [m[id_][0] for m in measures[name]]
+                fills[name] = np.mean(run_fills)
+                variance += np.var(run_fills, ddof=1) / len(run_fills) \
+                    if len(run_fills) > 1 else 0
+                sizes[name] = [m[id_][1] for m in measures[name]]
+            difference = abs(fills['engine'] - fills['reference'])
+            if difference > self._fill_tolerance + \
+                    self.FILL_ERRORS * sqrt(variance):
+                failures.append(f"tile {id_}: mean fill {fills['engine']:.3f}"
+                                f" differs from {fills['reference']:.3f}")
+            fill_difference = max(fill_difference, difference)
+
+            p_value = self.get_island_p_value(
+                sizes['engine'], sizes['reference'], self.PERMUTATIONS,
+                self._random)
+            if p_value < self._alpha:
+                failures.append(f"tile {id_}: island sizes differ "
+                                f"(p-value {p_value:.4f})")
+            island_p_value = min(island_p_value, p_value)
+
+        return {'shape': base_map.shape,
+                'tiles': len(tiles.get_names_list()) - 1,
+                'reference_seconds': seconds['reference'],
+                'engine_seconds': seconds['engine'],
+                'speedup': seconds['reference'] / max(seconds['engine'],
+                                                      1e-9),
+                'fill_difference': fill_difference,
+                'island_p_value': island_p_value,
+                'failures': failures}
+
+    @staticmethod
+    def check_invariants(base_map, raw_map, tiles):
+        """Returns list of invariants (see class description) violated by
+        map generated from base map"""
+        violations = []
+        tree_ids = MapStatistics.get_subtree_ids(tiles)
+        obstacles = ~np.isin(base_map, tree_ids)
+        if np.any(raw_map[obstacles] != base_map[obstacles]):
+            violations.append("tiles placed on obstacles")
+        unknown = set(np.unique(raw_map[~obstacles]).tolist()) - \
+            set(tree_ids)
+        if unknown:
+            violations.append(f"unknown ids {sorted(unknown)} on map")
+
+        counts = MapStatistics.get_subtree_counts(
+            MapStatistics.get_id_histogram(raw_map), tiles)
+        nodes = [tiles]
+        while nodes:
+            node = nodes.pop()
+            available = counts[node.get_tile().get_id()]
+            for child in node.get_children():
+                tile = child.get_tile()
+                achieved = counts[tile.get_id()]
+                allowed = floor(available * tile.get_fill()) + \
+                    tile.get_islands()
+                if achieved > allowed:
+                    violations.append(f"tile {tile.get_id()} has {achieved} "
+                                      f"cells, more than {allowed}")
+                available -= achieved
+
+                ids = MapStatistics.get_subtree_ids(child)
+                islands = MapStatistics.count_islands(raw_map, ids)
+                if MapStatistics.count_islands(raw_map, ids, 'all') != islands:
+                    violations.append(f"islands of tile {tile.get_id()} "
+                                      f"touch")
+                if islands > tile.get_islands():
+                    violations.append(f"tile {tile.get_id()} has {islands} "
+                                      f"islands, more than "
+                                      f"{tile.get_islands()}")
+                nodes.append(child)
+        return violations
+
+    @staticmethod
+    def get_tile_measures(raw_map, tiles):
+        """Returns dictionary of fill and array of island sizes (both
+        relative to cells left of parent) of every tile of map"""
+        counts = MapStatistics.get_subtree_counts(
+            MapStatistics.get_id_histogram(raw_map), tiles)
+        measures = {}
+        nodes = [tiles]
+        while nodes:
+            node = nodes.pop()
+            available = counts[node.get_tile().get_id()]
+            for child in node.get_children():
+                id_ = child.get_tile().get_id()
+                mask = np.isin(raw_map, MapStatistics.get_subtree_ids(child))
+                labels, islands = MapStatistics.label_regions(mask, mask)
+                sizes = np.bincount(labels.ravel(), minlength=islands + 1)[1:]
+                scale = max(available, 1)
+                measures[id_] = (counts[id_] / scale, sizes / scale)
+                available -= counts[id_]
+                nodes.append(child)
+        return measures
+
+    @staticmethod
+    def get_island_p_value(engine_sizes, reference_sizes, permutations,
+                           random_generator):
+        """Returns p-value of two sample Kolmogorov-Smirnov statistic
+        (largest distance of empirical distribution functions) of island
+        sizes of all runs of both engines. Islands of one run depend on each
+        other, so instead of its asymptotic distribution statistic is
+        compared with statistics of random splits of whole runs between
+        engines (permutation test)"""
+        runs = list(engine_sizes) + list(reference_sizes)
+        values = np.unique(np.concatenate(runs))
+        if len(values) == 0:
+            return 1.0
+        # islands of every run not bigger than every value
+        counts = np.array([np.searchsorted(np.sort(sizes), values,
+                                           side='right') for sizes in runs])
+        splits = np.zeros((permutations + 1, len(runs)), dtype=int)
+        splits[0, :len(engine_sizes)] = 1
+        order = list(range(len(runs)))
+        for split in splits[1:]:
+            random_generator.shuffle(order)
+            split[order[:len(engine_sizes)]] = 1
+        ecdfs = []
+        for group in (splits, 1 - splits):
+            cumulative = group @ counts
+            ecdfs.append(cumulative / np.maximum(cumulative[:, -1:], 1))
+        statistics = np.max(np.abs(ecdfs[0] - ecdfs[1]), axis=1)
+        exceeding = np.sum(statistics[1:] >= statistics[0] - 1e-12)
+        return float(exceeding + 1) / (permutations + 1)
@@ -0,0 +1,115 @@
+from concurrent.futures import ProcessPoolExecutor
+from random import Random
+
+import numpy as np
+
+from src.generator import TileMapGenerator
+from src.map_statistics import MapStatistics
+from src.tile_map import TileMap
+
+
+# read-only copies of generation input, set once in every worker process
+_shared_tiles = None
+_shared_map = None
+
+
+def _init_worker(tiles, raw_map):
+    global _shared_tiles, _shared_map
+    _shared_tiles = tiles
+    _shared_map = raw_map
+
+
+def _generate_candidate(random_seed):
+    """Generates single candidate from shared tiles and map"""
+    tile_map = TileMap(1, 1, _shared_tiles)
+    tile_map.update_map(_shared_map.copy())
+    TileMapGenerator(random_seed).generate_map(tile_map)
+    return tile_map.get_merged_map()
+
+
+class EnsembleGenerator:
+    """
+    EnsembleGenerator generates several candidate maps with different seeds
+    in parallel and keeps the one closest to requested fill and number of
+    islands of every tile.
+    :param candidates: Number of generated maps, defaults to 4
+    :type candidates: int
+    :param workers: Number of worker processes, defaults to None (number of
+    processors), 1 generates candidates in current process
+    :type workers: int
+    :param random_seed: Seed from which candidate seeds are drawn, defaults
+    to None
+    :type random_seed: int
+    :param island_weight: Weight of relative island number error compared to
+    fill error, defaults to 0.1
+    :type island_weight: float
+    """
+
+    def __init__(self, candidates=4, workers=None, random_seed=None,
+                 island_weight=0.1):
+        if candidates < 1:
+            raise ValueError("At least one candidate must be generated")
+        self._candidates = candidates
+        self._workers = workers
+        self._random = Random(random_seed)
+        self._island_weight = island_weight
+        self._scores = []
+
+    def get_scores(self):
+        """Returns scores of candidates from last generation"""
+        return self._scores
+
+    def generate_map(self, tile_map):
+        """Generates candidates from tile map and updates it with the best
+        one"""
+        tiles = tile_map.get_tiles()
+        raw_map = tile_map.get_map()
+        seeds = [self._random.randrange(2**32)
+                 for i in range(self._candidates)]
+
+        if self._workers == 1:
+            _init_worker(tiles, raw_map)
+            try:
+                candidates = [_generate_candidate(s) for s in seeds]
+            finally:
+                _init_worker(None, None)
+        else:
+            with ProcessPoolExecutor(max_workers=self._workers,
+                                     initializer=_init_worker,
+                                     initargs=(tiles, raw_map)) as pool:
+                candidates = list(pool.map(_generate_candidate, seeds))
+
+        self._scores = [self.score_map(candidate, tiles, self._island_weight)
+                        for candidate in candidates]
+        tile_map.update_map(candidates[int(np.argmin(self._scores))])
+        return tile_map
+
+    @staticmethod
+    def score_map(raw_map, tiles, island_weight=0.1):
+        """
+        Scores generated map, lower is better. For every tile sums absolute
+        difference between requested and achieved fill and relative error
+        of number of islands multiplied by island_weight.
+        :return: Score of map
+        :rtype: float
+        """
+        counts = MapStatistics.get_subtree_counts(
+            MapStatistics.get_id_histogram(raw_map), tiles)
+        score = 0.0
+        nodes = [tiles]
+        while nodes:
+            node = nodes.pop()
+            # children are generated one by one on what is left of parent
+            available = counts[node.get_tile().get_id()]
+            for child in node.get_children():
+                tile = child.get_tile()
+                achieved = counts[tile.get_id()]
+                if available > 0:
+                    score += abs(achieved / available - tile.get_fill())
+                available -= achieved
+                islands = MapStatistics.count_islands(
+                    raw_map, MapStatistics.get_subtree_ids(child))
+                score += island_weight * \
+                    abs(islands - tile.get_islands()) / tile.get_islands()
+                nodes.append(child)
+        return score
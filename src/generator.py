@@ -1,39 +1,341 @@
-from random import choice, randrange
-from math import floor
+from queue import Empty, Full, Queue
+from random import Random, randrange
+from math import ceil, floor
+from threading import Event, Thread
+from time import perf_counter
 
 import numpy as np
 
+from src.cost_model import CostModel
+from src.map_statistics import MapStatistics
+from src.sparse_layer import SparseLayer
+
+
+# changes whenever the same seed starts producing different maps
+GENERATOR_VERSION = 2
+
 
 class TileMapGenerator:
     """
     TileMapGenerator class contains methods of splitting tile map generation
     into steps of generating single tile type.
+    :param random_seed: Seed of random generator, defaults to None (map is
+    different every time). Generator has its own random.Random instance, so
+    seeding it doesn't change state of random module.
+    :type random_seed: int
+    :param time_budget: Maximum generation time in seconds, maps estimated
+    to take longer are rejected and generation taking longer is aborted,
+    defaults to None (no limit)
+    :type time_budget: float
+    :param memory_budget: Maximum estimated peak memory in bytes, defaults
+    to None (no limit)
+    :type memory_budget: int
+    :param cost_model: Model used to estimate cost, defaults to None
+    (CostModel with default calibration)
+    :type cost_model: CostModel
     """
 
-    def generate_map(self, tile_map):
+    def __init__(self, random_seed=None, time_budget=None,
+                 memory_budget=None, cost_model=None):
+        self._seed = random_seed
+        self._time_budget = time_budget
+        self._memory_budget = memory_budget
+        if cost_model is None:
+            cost_model = CostModel()
+        self._cost_model = cost_model
+
+    def estimate_cost(self, tile_map):
+        """Returns estimated cost of generating tile map (see
+        CostModel.estimate)"""
+        size_y, size_x = tile_map.get_map().shape
+        return self._cost_model.estimate(tile_map.get_tiles(), size_y, size_x)
+
+    def check_budget(self, tile_map):
+        """Returns cost estimate of tile map
+        :raises: :class:'BudgetExceededError': Estimated cost exceeds budget
+        """
+        estimate = self.estimate_cost(tile_map)
+        if self._time_budget is not None and \
+                estimate['seconds'] > self._time_budget:
+            raise BudgetExceededError(
+                f"Generation would take about {estimate['seconds']:.1f} s, "
+                f"budget is {self._time_budget} s", estimate)
+        if self._memory_budget is not None and \
+                estimate['bytes'] > self._memory_budget:
+            raise BudgetExceededError(
+                f"Generation would use about {estimate['bytes'] / 2**20:.1f}"
+                f" MiB, budget is {self._memory_budget / 2**20:.1f} MiB",
+                estimate)
+        return estimate
+
+    def generate_map(self, tile_map, delta_callback=None, delta_batch=1000):
         """Splits map into map of ids and tiles object and combines
-        generated map of ids with tiles"""
+        generated map of ids with tiles. Optional delta_callback is called
+        with arrays of flat cell indices and new ids of cells changed by
+        every delta_batch generation steps (see DeltaRecorder)
+        :raises: :class:'BudgetExceededError': Estimated cost exceeds budget
+        :raises: :class:'GenerationAbortedError': Time budget ran out, map
+        contains tiles generated until then
+        """
         raw_map = tile_map.get_map()
         tiles = tile_map.get_tiles()
 
-        self.generate_section(raw_map, tiles)
+        deadline = None
+        if self._time_budget is not None or self._memory_budget is not None:
+            self.check_budget(tile_map)
+        start = perf_counter()
+        if self._time_budget is not None:
+            deadline = start + self._time_budget
+        recorder = None
+        if delta_callback is not None:
+            recorder = DeltaRecorder(raw_map.shape, delta_callback,
+                                     delta_batch)
+        workspace = GenerationWorkspace(raw_map.shape, recorder, deadline)
+        try:
+            self.generate_section(raw_map, tiles, workspace,
+                                  Random(self._seed))
+        except GenerationAbortedError as e:
+            tile_map.update_map(raw_map)
+            e.progress = {
+                'generated_tiles': workspace.get_generated_tiles(),
+                'total_tiles': len(tiles.get_names_list()) - 1,
+                'elapsed_seconds': perf_counter() - start}
+            raise
+        finally:
+            if recorder is not None:
+                recorder.flush()
         tile_map.update_map(raw_map)
+        tile_map.set_sparse_layers(workspace.get_sparse_layers())
         return tile_map
 
-    def generate_section(self, raw_map, tile_tree_node):
-        """Calls generation of each tile id"""
+    def iter_deltas(self, tile_map, delta_batch=1000, max_pending=4):
+        """Generates map in background thread and yields (cells, ids)
+        batches of changes as they are made. At most max_pending batches
+        wait in queue, so generation pauses when they are not consumed.
+        Tile map must not be used until iteration ends."""
+        batches = Queue(max_pending)
+        stopped = Event()
+        end = object()
+
+        def put(item):
+            while not stopped.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return
+                except Full:
+                    continue
+            raise GenerationAbortedError("Delta consumer stopped")
+
+        def run():
+            try:
+                self.generate_map(tile_map, lambda *delta: put(delta),
+                                  delta_batch)
+                result = end
+            except BaseException as e:
+                result = e
+            if not stopped.is_set():
+                try:
+                    put(result)
+                except GenerationAbortedError:
+                    pass
+
+        worker = Thread(target=run, daemon=True)
+        worker.start()
+        try:
+            while True:
+                item = batches.get()
+                if item is end:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            stopped.set()
+            # unblock worker waiting for free place in queue
+            try:
+                while True:
+                    batches.get_nowait()
+            except Empty:
+                pass
+            worker.join()
+
+    def generate_section(self, raw_map, tile_tree_node, workspace=None,
+                         random_generator=None):
+        """Calls generation of each tile id. All tiles of one generation
+        share single workspace buffer and random generator. Sparse tiles
+        are generated after dense ones into sparse layer kept in
+        workspace"""
+        if workspace is None:
+            workspace = GenerationWorkspace(raw_map.shape)
+        if random_generator is None:
+            random_generator = Random(self._seed)
         parent_tile = tile_tree_node.get_tile()
-        children = tile_tree_node.get_children()
+        children = [node for node in tile_tree_node.get_children()
+                    if not node.get_tile().is_sparse()]
+        sparse_children = [node for node in tile_tree_node.get_children()
+                           if node.get_tile().is_sparse()]
 
         for tile_node in children:
             tile = tile_node.get_tile()
-            gen = BorderGeneration(raw_map, parent_tile.get_id())
+            if tile.get_refinement() > 0:
+                gen = CoarseToFineGeneration(
+                    raw_map, parent_tile.get_id(), tile.get_refinement(),
+                    workspace, random_generator)
+            else:
+                gen = BorderGeneration(raw_map, parent_tile.get_id(),
+                                       workspace, random_generator)
             raw_map = gen.generate_tile(raw_map,
                                         parent_tile.get_id(),
                                         tile.get_id(),
                                         tile.get_fill(),
                                         tile.get_islands())
-            self.generate_section(raw_map, tile_node)
+            workspace.add_generated_tile(tile.get_id())
+            self.generate_section(raw_map, tile_node, workspace,
+                                  random_generator)
+
+        if sparse_children:
+            parent_id = parent_tile.get_id()
+            flat_map = raw_map.reshape(-1)
+            gen = SparseGeneration(raw_map.shape, workspace, random_generator)
+            workspace.add_sparse_layer(gen.generate_section(
+                np.flatnonzero(flat_map == parent_id), sparse_children,
+                lambda cell: flat_map[cell] == parent_id))
+
+
+class GenerationWorkspace:
+    """
+    GenerationWorkspace holds buffers reused by every BorderGeneration of
+    single map generation, so generating tile tree of any size allocates
+    padded map copy only once.
+    :param shape: Shape of generated map (without padding).
+    :type shape: tuple
+    :param recorder: Recorder of cells changed on this map, defaults to None
+    :type recorder: DeltaRecorder
+    :param deadline: perf_counter time after which generation is aborted,
+    defaults to None
+    :type deadline: float
+    """
+
+    # number of growth steps between checks of deadline
+    DEADLINE_CHECK_STEPS = 1024
+
+    def __init__(self, shape, recorder=None, deadline=None):
+        padded_shape = (shape[0] + 2, shape[1] + 2)
+        self._buffer = np.full(padded_shape, -1, dtype=int)
+        self._mask = np.zeros(padded_shape, dtype=bool)
+        self._labels = None
+        self._coarse_workspaces = {}
+        self._recorder = recorder
+        self._deadline = deadline
+        self._generated_tiles = []
+        self._sparse_layers = []
+
+    def check_deadline(self):
+        """:raises: :class:'GenerationAbortedError': Deadline has passed"""
+        if self._deadline is not None and perf_counter() > self._deadline:
+            raise GenerationAbortedError("Generation exceeded time budget")
+
+    def add_generated_tile(self, tile_id):
+        self._generated_tiles.append(tile_id)
+
+    def add_sparse_layer(self, layer):
+        self._sparse_layers.append(layer)
+
+    def get_sparse_layers(self):
+        return list(self._sparse_layers)
+
+    def get_generated_tiles(self):
+        """Returns ids of tiles generated so far"""
+        return list(self._generated_tiles)
+
+    def get_buffer(self):
+        return self._buffer
+
+    def get_recorder(self):
+        return self._recorder
+
+    def get_mask(self):
+        return self._mask
+
+    def get_labels(self):
+        """Returns buffer of island numbers (same shape as buffer), created
+        on first use"""
+        if self._labels is None:
+            self._labels = np.zeros(self._buffer.shape, dtype=int)
+        return self._labels
+
+    def get_coarse_workspace(self, shape):
+        """Returns workspace for downsampled map of shape, created on first
+        use of this shape"""
+        shape = tuple(shape)
+        if shape not in self._coarse_workspaces:
+            self._coarse_workspaces[shape] = GenerationWorkspace(
+                shape, deadline=self._deadline)
+        return self._coarse_workspaces[shape]
+
+    def load(self, raw_map, parent_id):
+        """Copies map into buffer interior and masks all ids other than
+        parent id. Border of buffer is never written so it stays -1"""
+        interior = self._buffer[1:-1, 1:-1]
+        np.copyto(interior, raw_map)
+        np.not_equal(interior, parent_id, out=self._mask[1:-1, 1:-1])
+        np.copyto(interior, -1, where=self._mask[1:-1, 1:-1])
+        return self._buffer
+
+
+class DeltaRecorder:
+    """
+    DeltaRecorder collects cells changed during generation and passes them
+    to callback in batches, so generation can be followed (e.g. animated)
+    without copying whole map. Batch holds flat indices of changed cells
+    (row * width + column of unpadded map) and their new ids, in order of
+    changes. Memory used doesn't depend on number of batches.
+    :param shape: Shape of generated map
+    :type shape: tuple
+    :param callback: Function called with arrays of cells and ids
+    :type callback: callable
+    :param batch_size: Number of changed cells in single batch
+    :type batch_size: int
+    """
+
+    def __init__(self, shape, callback, batch_size=1000):
+        if batch_size < 1:
+            raise ValueError(f"Batch size must be positive, got {batch_size}")
+        self._width = shape[1]
+        self._callback = callback
+        self._cells = np.empty(batch_size, dtype=np.int64)
+        self._ids = np.empty(batch_size, dtype=np.int64)
+        self._count = 0
+
+    def record(self, coord, id_):
+        """Records change of single cell at padded coordinate"""
+        self._cells[self._count] = \
+            (coord[0] - 1) * self._width + coord[1] - 1
+        self._ids[self._count] = id_
+        self._count += 1
+        if self._count == len(self._cells):
+            self.flush()
+
+    def record_mask(self, mask, id_):
+        """Records change of all cells of padded boolean mask to id"""
+        cells = np.flatnonzero(mask[1:-1, 1:-1])
+        start = 0
+        while start < len(cells):
+            count = min(len(cells) - start, len(self._cells) - self._count)
+            self._cells[self._count:self._count + count] = \
+                cells[start:start + count]
+            self._ids[self._count:self._count + count] = id_
+            self._count += count
+            start += count
+            if self._count == len(self._cells):
+                self.flush()
+
+    def flush(self):
+        """Passes recorded changes to callback"""
+        if self._count:
+            count, self._count = self._count, 0
+            self._callback(self._cells[:count].copy(),
+                           self._ids[:count].copy())
 
 
 class BorderGeneration:
@@ -44,50 +346,73 @@ class BorderGeneration:
     :type raw_map: :class:'numpy.ndarray'
     :param parent_id: Parent tile id, on which tile islands will be generated.
     :type parent_id: int
+    :param workspace: Shared buffers to generate in, defaults to None
+    (new workspace is created)
+    :type workspace: GenerationWorkspace
+    :param random_generator: Source of randomness, defaults to None (new
+    unseeded generator)
+    :type random_generator: :class:'random.Random'
     """
 
-    def __init__(self, raw_map, parent_id):
+    def __init__(self, raw_map, parent_id, workspace=None,
+                 random_generator=None):
         """Adds padding around map to avoid getting out of bounds and masks
         all ids not suitable for generation"""
-        self._map = np.pad(
-            raw_map, (1, 1), mode='constant', constant_values=-1)
-        self._map[self._map != parent_id] = -1
+        raw_map = np.asarray(raw_map)
+        if workspace is None:
+            workspace = GenerationWorkspace(raw_map.shape)
+        self._workspace = workspace
+        self._map = workspace.load(raw_map, parent_id)
         self._parent_id = parent_id
+        self._recorder = workspace.get_recorder()
+        if random_generator is None:
+            random_generator = Random()
+        self._random = random_generator
 
     def generate_tile(self, raw_map, parent_tile, tile_id, fill, islands=1):
         """Generates single tile type. Creates non connecting islands
         one by one and applying mask around them to avoid connections"""
-        number_of_tiles = len(self.get_coordinate_tuples(self._parent_id))
-        for fill in self.get_fill_per_island(fill, islands):
+        number_of_tiles = self.count_tiles(self._parent_id)
+        for fill in self.get_fill_per_island(fill, islands,
+                                             random_generator=self._random):
+            self._workspace.check_deadline()
             self.apply_mask(tile_id)  # apply mask to avoid connections
             n_tiles_to_gen = floor(number_of_tiles * fill)
             self.generate_island(n_tiles_to_gen, self._parent_id, tile_id)
             gen_map = self.get_trimmed_map()
-        raw_map = self.apply_generated_section(raw_map, gen_map, tile_id)
+        raw_map = self.apply_generated_section(
+            raw_map, gen_map, tile_id,
+            self._workspace.get_mask()[1:-1, 1:-1])
         return raw_map
 
     def apply_mask(self, tile_id):
         """Applies mask of -1 around existing islands to avoid connections"""
-        for coord in self.get_coordinate_tuples(tile_id):
-            for c in self.get_adj_coords(coord, mode='all'):
-                if self._map[c] != tile_id:
-                    self._map[c] = -1
-        np.put(self._map, tile_id, -1)
+        island = self._map == tile_id
+        near = np.zeros_like(island)
+        for dy, dx in self.get_adj_coords((1, 1), mode='all'):
+            near[1:-1, 1:-1] |= island[dy:dy + island.shape[0] - 2,
+                                       dx:dx + island.shape[1] - 2]
+        near &= ~island
+        self._map[near] = -1
 
     @staticmethod
-    def apply_generated_section(output_map, map_to_apply, id_to_apply):
-        """Applies generated tile id on map"""
-        for row_number, row in enumerate(map_to_apply):
-            for column_number, id_ in enumerate(row):
-                if id_ == id_to_apply:
-                    output_map[row_number, column_number] = id_
+    def apply_generated_section(output_map, map_to_apply, id_to_apply,
+                                out_mask=None):
+        """Applies generated tile id on map. Optional boolean out_mask of map
+        shape is used as temporary buffer instead of allocating new one"""
+        out_mask = np.equal(map_to_apply, id_to_apply, out=out_mask)
+        np.copyto(output_map, id_to_apply, where=out_mask)
         return output_map
 
     @staticmethod
-    def get_fill_per_island(fill, islands, size_diff=5):
+    def get_fill_per_island(fill, islands, size_diff=5,
+                            random_generator=None):
         """Randomizes island sizes. Biggest islands can be
         size_diff times bigger that smallest islands"""
-        random_sizes = [randrange(1, size_diff) for i in range(islands)]
+        random_size = randrange
+        if random_generator is not None:
+            random_size = random_generator.randrange
+        random_sizes = [random_size(1, size_diff) for i in range(islands)]
         sum_of_sizes = sum(random_sizes)
         fills = [size / sum_of_sizes * fill for size in random_sizes]
         return fills
@@ -99,20 +424,31 @@ class BorderGeneration:
         Note that island number has priority over fill so if there are no
         locations to generate new tile result will have less fill, but
         number of islands will be preserved"""
-        # selecting seed
-        coord_tuples = self.get_coordinate_tuples(parent_id)
-        seed = self.get_seed_coordinates(coord_tuples)
+        # selecting seed, exit if parent tile is already used up
+        coords = self.get_coordinates(parent_id)
+        if len(coords) == 0:
+            return
+        seed = tuple(self.get_seed_coordinates(coords).tolist())
         self._map[seed] = child_id
+        if self._recorder is not None:
+            self._recorder.record(seed, child_id)
 
-        border_tiles = [seed]
+        # seed without free neighbours can't grow
+        border_tiles = []
+        if self.check_if_border_tile(seed, parent_id):
+            border_tiles.append(seed)
 
         for x in range(tiles_to_generate - 1):
             # exit if no places to generate
             if len(border_tiles) == 0:
                 return
+            if x % GenerationWorkspace.DEADLINE_CHECK_STEPS == 0:
+                self._workspace.check_deadline()
             # generating new tile
             selected_tile = self.get_chosen_tile_coord(border_tiles, parent_id)
             self._map[selected_tile] = child_id
+            if self._recorder is not None:
+                self._recorder.record(selected_tile, child_id)
             # check if any adjecent tiles stopped being border tiles
             tiles_adj = self.get_adj_coords(selected_tile)
             tiles_to_check = self.coords_in_both_lists(
@@ -124,27 +460,33 @@ class BorderGeneration:
             if self.check_if_border_tile(selected_tile, parent_id):
                 border_tiles.append(selected_tile)
 
+    def count_tiles(self, searched_id):
+        """Returns number of tiles on map with searched id"""
+        return int(np.count_nonzero(np.equal(
+            self._map, searched_id, out=self._workspace.get_mask())))
+
+    def get_coordinates(self, searched_id):
+        """Returns array of coordinates (row, column) of all tiles on map
+        with searched id"""
+        return np.argwhere(np.equal(
+            self._map, searched_id, out=self._workspace.get_mask()))
+
     def get_coordinate_tuples(self, searched_id):
         """Returns list of tuples of coordinates of all tiles on map
         with searched id"""
-        tuples = []
-        for row_number, row in enumerate(self._map):
-            for column, id_ in enumerate(row):
-                if id_ == searched_id:
-                    tuples.append((row_number, column))
-        return tuples
+        return [tuple(c) for c in self.get_coordinates(searched_id).tolist()]
 
     def get_seed_coordinates(self, coord_tuples):
         """Returns random seed coordinate from list of suitable coordinates"""
-        return choice(coord_tuples)
+        return self._random.choice(coord_tuples)
 
     def get_chosen_tile_coord(self, border_tiles, parent_id):
         """Returns coordinate of tile to fill from suitable locations
         around selected border tile"""
-        coord = choice(border_tiles)
+        coord = self._random.choice(border_tiles)
         options = [c for c in self.get_adj_coords(coord)
                    if self._map[c] == parent_id]
-        return choice(options)
+        return self._random.choice(options)
 
     def check_if_border_tile(self, coord, parent_id):
         """Checks if around tile there are any spaces left to generate"""
@@ -176,3 +518,365 @@ class BorderGeneration:
     def get_trimmed_map(self):
         """Returns map trimmed of added bounds"""
         return self._map[1:-1, 1:-1]
+
+
+class CoarseToFineGeneration(BorderGeneration):
+    """
+    CoarseToFineGeneration generates islands on map downsampled by factor of
+    2**refinement with the same growth rules as BorderGeneration, upsamples
+    them and regrows only boundary cells of every island at full resolution.
+    Islands smaller than single block are generated directly on full map.
+    Number of islands is preserved and fill stays within 10% of requested
+    fill (as long as parent tile has enough space), while number of growth
+    steps drops roughly by factor of 4**refinement.
+    :param raw_map: 2D array of tiles ids.
+    :type raw_map: :class:'numpy.ndarray'
+    :param parent_id: Parent tile id, on which tile islands will be generated.
+    :type parent_id: int
+    :param refinement: Downsampling level, 0 generates directly on full map
+    :type refinement: int
+    :param workspace: Shared buffers to generate in, defaults to None
+    :type workspace: GenerationWorkspace
+    :param random_generator: Source of randomness, defaults to None
+    :type random_generator: :class:'random.Random'
+    """
+
+    def __init__(self, raw_map, parent_id, refinement, workspace=None,
+                 random_generator=None):
+        BorderGeneration.__init__(self, raw_map, parent_id, workspace,
+                                  random_generator)
+        self._block = 2 ** refinement
+
+    def generate_tile(self, raw_map, parent_tile, tile_id, fill, islands=1):
+        """Generates islands on coarse map, upsamples them and refines their
+        borders. Islands that do not fit on coarse map are generated
+        directly on full map"""
+        number_of_tiles = self.count_tiles(self._parent_id)
+        targets = [floor(number_of_tiles * island_fill) for island_fill
+                   in self.get_fill_per_island(
+                       fill, islands, random_generator=self._random)]
+        coarse_targets = [t for t in targets if t >= self._block ** 2]
+        fine_targets = [t for t in targets if t < self._block ** 2]
+
+        coarse_labels = self.generate_coarse_islands(coarse_targets, tile_id)
+        labels = self.upsample_labels(coarse_labels, tile_id)
+        generated = int(coarse_labels.max(initial=0))
+        lost = self.refine_islands(labels, coarse_targets[:generated],
+                                   tile_id)
+
+        for target in lost + coarse_targets[generated:] + fine_targets:
+            self._workspace.check_deadline()
+            self.apply_mask(tile_id)
+            self.generate_island(target, self._parent_id, tile_id)
+
+        raw_map = self.apply_generated_section(
+            raw_map, self.get_trimmed_map(), tile_id,
+            self._workspace.get_mask()[1:-1, 1:-1])
+        return raw_map
+
+    def get_coarse_map(self):
+        """Returns downsampled map where block is parent tile only if all
+        of its cells are parent tiles"""
+        fine = self.get_trimmed_map()
+        b = self._block
+        coarse_map = np.full((ceil(fine.shape[0] / b),
+                              ceil(fine.shape[1] / b)), -1, dtype=fine.dtype)
+        # blocks cut by map edge are never available
+        full_y, full_x = fine.shape[0] // b, fine.shape[1] // b
+        available = np.equal(fine, self._parent_id,
+                             out=self._workspace.get_mask()[1:-1, 1:-1])
+        blocks = available[:full_y * b, :full_x * b].reshape(
+            full_y, b, full_x, b)
+        coarse_map[:full_y, :full_x][np.all(blocks, axis=(1, 3))] = \
+            self._parent_id
+        return coarse_map
+
+    def generate_coarse_islands(self, targets, tile_id):
+        """Generates islands on coarse map and returns map of island
+        numbers (0 for no island) for each coarse cell"""
+        coarse_map = self.get_coarse_map()
+        coarse_gen = BorderGeneration(
+            coarse_map, self._parent_id,
+            self._workspace.get_coarse_workspace(coarse_map.shape),
+            self._random)
+        coarse_labels = np.zeros(coarse_map.shape, dtype=int)
+        for island, target in enumerate(targets, 1):
+            self._workspace.check_deadline()
+            coarse_gen.apply_mask(tile_id)
+            if coarse_gen.count_tiles(self._parent_id) == 0:
+                break
+            # rounding down, so that island never exceeds its target
+            n_blocks = target // self._block ** 2
+            coarse_gen.generate_island(n_blocks, self._parent_id, tile_id)
+            new_cells = (coarse_gen.get_trimmed_map() == tile_id) & \
+                (coarse_labels == 0)
+            coarse_labels[new_cells] = island
+        return coarse_labels
+
+    def upsample_labels(self, coarse_labels, tile_id):
+        """Places coarse islands on map and returns padded map of island
+        numbers"""
+        size_y, size_x = self.get_trimmed_map().shape
+        b = self._block
+        full_y, full_x = size_y // b, size_x // b
+        labels = self._workspace.get_labels()
+        labels.fill(0)
+        blocks = labels[1:1 + full_y * b, 1:1 + full_x * b].reshape(
+            full_y, b, full_x, b)
+        blocks[...] = coarse_labels[:full_y, None, :full_x, None]
+        island = np.greater(labels, 0, out=self._workspace.get_mask())
+        np.copyto(self._map, tile_id, where=island)
+        if self._recorder is not None:
+            self._recorder.record_mask(island, tile_id)
+        return labels
+
+    def refine_islands(self, labels, targets, tile_id):
+        """Returns boundary cells of all islands to parent tile and regrows
+        every island to its target size. Returns targets of islands which
+        were stripped whole and have no free cell left for new seed"""
+        island = self._map == tile_id
+        boundary = island.copy()
+        boundary[1:-1, 1:-1] &= ~(island[:-2, 1:-1] & island[2:, 1:-1] &
+                                  island[1:-1, :-2] & island[1:-1, 2:])
+        stripped_labels = labels[boundary]
+        stripped = np.argwhere(boundary)
+        labels[boundary] = 0
+        # islands split by stripping (narrow parts) keep their boundary
+        remaining = labels > 0
+        parts, n_parts = MapStatistics.label_regions(labels, remaining)
+        part_islands = np.zeros(n_parts + 1, dtype=int)
+        part_islands[parts[remaining]] = labels[remaining]
+        split = np.bincount(part_islands[1:],
+                            minlength=len(targets) + 1) > 1
+        restored = split[stripped_labels]
+        boundary[tuple(stripped[restored].T)] = False
+        labels[tuple(stripped[restored].T)] = stripped_labels[restored]
+        self._map[boundary] = self._parent_id
+        if self._recorder is not None:
+            self._recorder.record_mask(boundary, self._parent_id)
+
+        island &= ~boundary
+        border = np.zeros_like(island)
+        border[1:-1, 1:-1] = island[1:-1, 1:-1] & (
+            (self._map[:-2, 1:-1] == self._parent_id) |
+            (self._map[2:, 1:-1] == self._parent_id) |
+            (self._map[1:-1, :-2] == self._parent_id) |
+            (self._map[1:-1, 2:] == self._parent_id))
+        border_labels = labels[border]
+        border_coords = np.argwhere(border)
+        sizes = np.bincount(labels.ravel(), minlength=len(targets) + 1)
+
+        lost = []
+        for island_number, target in enumerate(targets, 1):
+            border_tiles = [tuple(c) for c in border_coords[
+                border_labels == island_number].tolist()]
+            if sizes[island_number] == 0:
+                # islands regrown before may have taken stripped cells
+                seeds = [tuple(c) for c in stripped[
+                    stripped_labels == island_number].tolist()
+                    if self._map[tuple(c)] == self._parent_id and
+                    self.check_if_free_tile(labels, tuple(c), island_number)]
+                if len(seeds) == 0:
+                    lost.append(target)
+                    continue
+                seed = self.get_seed_coordinates(seeds)
+                self._map[seed] = tile_id
+                labels[seed] = island_number
+                if self._recorder is not None:
+                    self._recorder.record(seed, tile_id)
+                sizes[island_number] = 1
+                border_tiles = [seed]
+            self.regrow_island(labels, island_number,
+                               target - sizes[island_number],
+                               border_tiles, tile_id)
+        return lost
+
+    def regrow_island(self, labels, island_number, tiles_to_generate,
+                      border_tiles, tile_id):
+        """Grows island from its border tiles like generate_island, but
+        skips tiles that would touch other islands"""
+        positions = {c: i for i, c in enumerate(border_tiles)}
+        steps = 0
+        while tiles_to_generate > 0 and border_tiles:
+            steps += 1
+            if steps % GenerationWorkspace.DEADLINE_CHECK_STEPS == 0:
+                self._workspace.check_deadline()
+            coord = self._random.choice(border_tiles)
+            options = [c for c in self.get_adj_coords(coord)
+                       if self._map[c] == self._parent_id and
+                       self.check_if_free_tile(labels, c, island_number)]
+            if len(options) == 0:
+                # swap with last element to remove in constant time
+                last = border_tiles.pop()
+                if last != coord:
+                    border_tiles[positions[coord]] = last
+                    positions[last] = positions[coord]
+                del positions[coord]
+                continue
+            selected_tile = self._random.choice(options)
+            self._map[selected_tile] = tile_id
+            labels[selected_tile] = island_number
+            if self._recorder is not None:
+                self._recorder.record(selected_tile, tile_id)
+            positions[selected_tile] = len(border_tiles)
+            border_tiles.append(selected_tile)
+            tiles_to_generate -= 1
+
+    def check_if_free_tile(self, labels, coord, island_number):
+        """Checks if tile does not touch any other island"""
+        for c in self.get_adj_coords(coord, mode='all'):
+            if labels[c] != 0 and labels[c] != island_number:
+                return False
+        return True
+
+
+class SparseGeneration:
+    """
+    SparseGeneration grows islands with the same rules as BorderGeneration
+    but on list of flat indices of parent cells instead of dense map. Only
+    cells taken by generated islands are kept (in sets), so time and memory
+    depend on number of generated cells, not on map area. Tiles and all
+    their children are returned as single SparseLayer.
+    :param shape: Shape of map
+    :type shape: tuple
+    :param workspace: Workspace of generation (used for deadline and
+    progress), defaults to None
+    :type workspace: GenerationWorkspace
+    :param random_generator: Source of randomness, defaults to None
+    :type random_generator: :class:'random.Random'
+    """
+
+    # random picks of parent cell before free cells are listed
+    SEED_ATTEMPTS = 64
+
+    def __init__(self, shape, workspace=None, random_generator=None):
+        self._shape = tuple(shape)
+        if workspace is None:
+            workspace = GenerationWorkspace((0, 0))
+        self._workspace = workspace
+        if random_generator is None:
+            random_generator = Random()
+        self._random = random_generator
+
+    def generate_section(self, parent_cells, tile_nodes, is_parent=None):
+        """Generates tiles of nodes and their children on parent cells
+        (sorted flat indices) and returns them as SparseLayer. is_parent
+        tells if flat index is parent cell, defaults to set lookup"""
+        cells, ids = self.generate_nodes(parent_cells, tile_nodes, is_parent)
+        if cells:
+            return SparseLayer(self._shape, np.concatenate(cells),
+                               np.concatenate(ids))
+        return SparseLayer(self._shape)
+
+    def generate_nodes(self, parent_cells, tile_nodes, is_parent=None):
+        if is_parent is None:
+            is_parent = set(parent_cells.tolist()).__contains__
+        cells, ids = [], []
+        taken = set()  # cells of earlier siblings
+        for tile_node in tile_nodes:
+            tile = tile_node.get_tile()
+            tile_cells = self.generate_tile(parent_cells, is_parent, taken,
+                                            tile.get_fill(),
+                                            tile.get_islands())
+            taken.update(tile_cells.tolist())
+            cells.append(tile_cells)
+            ids.append(np.full(len(tile_cells), tile.get_id()))
+            self._workspace.add_generated_tile(tile.get_id())
+            child_cells, child_ids = self.generate_nodes(
+                tile_cells, tile_node.get_children())
+            cells += child_cells
+            ids += child_ids
+        return cells, ids
+
+    def generate_tile(self, parent_cells, is_parent, taken, fill, islands=1):
+        """Generates islands on parent cells not taken by other tiles and
+        returns sorted array of their cells. Cells around finished islands
+        are blocked, so islands never touch"""
+        number_of_tiles = len(parent_cells) - len(taken)
+        blocked = set(taken)
+        placed = []
+        for island_fill in BorderGeneration.get_fill_per_island(
+                fill, islands, random_generator=self._random):
+            self._workspace.check_deadline()
+            island = self.generate_island(
+                parent_cells, is_parent, blocked,
+                floor(number_of_tiles * island_fill))
+            for cell in island:
+                blocked.update(self.get_adj_cells(cell, mode='all'))
+            placed += island
+        return np.array(sorted(placed), dtype=np.int64)
+
+    def generate_island(self, parent_cells, is_parent, blocked,
+                        tiles_to_generate):
+        """Grows single island from random free parent cell, adding used
+        cells to blocked. Returns list of island cells"""
+        seed = self.get_seed(parent_cells, blocked)
+        if seed is None:
+            return []
+        blocked.add(seed)
+        island = [seed]
+        border_tiles = [seed]
+        positions = {seed: 0}
+        while len(island) < tiles_to_generate and border_tiles:
+            if len(island) % GenerationWorkspace.DEADLINE_CHECK_STEPS == 0:
+                self._workspace.check_deadline()
+            cell = self._random.choice(border_tiles)
+            options = [c for c in self.get_adj_cells(cell)
+                       if c not in blocked and is_parent(c)]
+            if len(options) == 0:
+                # swap with last element to remove in constant time
+                last = border_tiles.pop()
+                if last != cell:
+                    border_tiles[positions[cell]] = last
+                    positions[last] = positions[cell]
+                del positions[cell]
+                continue
+            selected = self._random.choice(options)
+            blocked.add(selected)
+            island.append(selected)
+            positions[selected] = len(border_tiles)
+            border_tiles.append(selected)
+        return island
+
+    def get_seed(self, parent_cells, blocked):
+        """Returns random parent cell that is not blocked or None. Picks
+        random parent cells first, as most of them are usually free"""
+        if len(parent_cells) == 0:
+            return None
+        for attempt in range(self.SEED_ATTEMPTS):
+            cell = int(parent_cells[self._random.randrange(len(parent_cells))])
+            if cell not in blocked:
+                return cell
+        free = parent_cells[~np.isin(parent_cells, np.fromiter(
+            blocked, dtype=np.int64, count=len(blocked)))]
+        if len(free) == 0:
+            return None
+        return int(free[self._random.randrange(len(free))])
+
+    def get_adj_cells(self, cell, mode='sides'):
+        """Returns flat indices of cells adjacent to cell inside map, in
+        the same order as BorderGeneration.get_adj_coords"""
+        width = self._shape[1]
+        y, x = divmod(cell, width)
+        return [(y + dy) * width + x + dx
+                for dy, dx in BorderGeneration.get_adj_coords((0, 0), mode)
+                if 0 <= y + dy < self._shape[0] and 0 <= x + dx < width]
+
+
+class BudgetExceededError(Exception):
+    """Raised when estimated cost of generation exceeds budget, estimate
+    is dictionary returned by CostModel.estimate"""
+
+    def __init__(self, message, estimate=None):
+        Exception.__init__(self, message)
+        self.estimate = estimate
+
+
+class GenerationAbortedError(Exception):
+    """Raised when generation is stopped before map is finished, progress
+    is dictionary of generated tile ids, number of all tiles and elapsed
+    time (if known)"""
+
+    def __init__(self, message, progress=None):
+        Exception.__init__(self, message)
+        self.progress = progress
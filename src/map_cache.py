@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from src.generator import GENERATOR_VERSION, TileMapGenerator
+
+
+class TileMapCache:
+    """
+    TileMapCache stores generated maps on local disk under key computed from
+    tiles tree, starting map, seed and generator version, so the same map is
+    generated only once. Files are written atomically and read back as
+    read-only memory-mapped arrays. Least recently used maps are removed when
+    cache grows over max_bytes. Maps generated without seed are random, so
+    they are never cached. Sparse layers of generated maps are merged into
+    them, so maps are the same whether they come from cache or not.
+    :param directory: Directory of cache files, created if missing
+    :type directory: str
+    :param max_bytes: Maximum size of cache files, defaults to 1 GiB
+    :type max_bytes: int
+    """
+
+    SUFFIX = '.npy'
+
+    def __init__(self, directory, max_bytes=2**30):
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._stats = {'hits': 0, 'misses': 0, 'bypassed': 0,
+                       'evictions': 0}
+
+    def get_stats(self):
+        """Returns dictionary of hit, miss, bypass and eviction counters"""
+        return dict(self._stats)
+
+    @staticmethod
+    def get_key(tile_map, random_seed):
+        """Returns stable hash of everything that determines generated map"""
+        raw_map = np.ascontiguousarray(tile_map.get_map())
+        description = json.dumps({
+            'tiles': tile_map.get_tiles().to_dict(),
+            'shape': list(raw_map.shape),
+            'map': hashlib.sha256(raw_map.tobytes()).hexdigest(),
+            'dtype': raw_map.dtype.str,
+            'seed': random_seed,
+            'version': GENERATOR_VERSION,
+        }, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(description.encode()).hexdigest()
+
+    def generate_map(self, tile_map, random_seed, generator=None):
+        """Updates tile map with cached map or generates it with generator
+        (defaults to TileMapGenerator with random_seed) and stores result.
+        Map returned from cache is read-only memory-mapped array."""
+        if generator is None:
+            generator = TileMapGenerator(random_seed)
+        if random_seed is None:
+            self._stats['bypassed'] += 1
+            generator.generate_map(tile_map)
+            tile_map.merge_sparse_layers()
+            return tile_map
+
+        path = self.get_path(self.get_key(tile_map, random_seed))
+        try:
+            raw_map = np.load(path, mmap_mode='r')
+        except (FileNotFoundError, ValueError):
+            raw_map = None
+        if raw_map is not None:
+            self._stats['hits'] += 1
+            os.utime(path)  # mark as recently used
+            tile_map.update_map(raw_map)
+            return tile_map
+
+        self._stats['misses'] += 1
+        generator.generate_map(tile_map)
+        tile_map.merge_sparse_layers()
+        self.store(path, tile_map.get_map())
+        self.evict(keep=path)
+        return tile_map
+
+    def get_path(self, key):
+        return os.path.join(self._directory, key + self.SUFFIX)
+
+    def store(self, path, raw_map):
+        """Writes map to temporary file and renames it, so that readers
+        never see partially written map"""
+        descriptor, temporary = tempfile.mkstemp(
+            dir=self._directory, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                np.save(f, raw_map)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary, path)
+        except BaseException:
+            os.remove(temporary)
+            raise
+
+    def get_size(self):
+        """Returns total size of cached maps in bytes"""
+        return sum(size for path, size, used in self.get_entries())
+
+    def get_entries(self):
+        """Returns list of (path, size, last use time) of cached maps"""
+        entries = []
+        for entry in os.scandir(self._directory):
+            if entry.name.endswith(self.SUFFIX):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue  # removed by other process
+                entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def evict(self, keep=None):
+        """Removes least recently used maps until cache fits in max_bytes,
+        map at path keep is never removed"""
+        entries = sorted(self.get_entries(), key=lambda entry: entry[2])
+        total = sum(size for path, size, used in entries)
+        for path, size, used in entries:
+            if total <= self._max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                self._stats['evictions'] += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        for path, size, used in self.get_entries():
+            os.remove(path)
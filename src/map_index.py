@@ -0,0 +1,165 @@
+import numpy as np
+
+from src.map_statistics import MapStatistics
+
+
+class TileMapIndex:
+    """
+    TileMapIndex is built once from generated map and answers spatial
+    queries without scanning whole map. It stores sorted flat indices of
+    cells of every id, cells and bounding boxes of every island (connected
+    by sides region of single id) and set of ids present in every square
+    block of map. Index has to be rebuilt after map changes.
+    :param tile_map: Indexed map
+    :type tile_map: TileMap
+    :param block_size: Side of block in block summary, defaults to 64
+    :type block_size: int
+    """
+
+    def __init__(self, tile_map, block_size=64):
+        raw_map = tile_map.get_map()
+        self._shape = raw_map.shape
+        self._block_size = block_size
+        flat = raw_map.ravel()
+
+        # cells of every id, stable sort keeps them in ascending order
+        order = np.argsort(flat, kind='stable')
+        ids, starts = np.unique(flat[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+        self._ids = ids
+        self._cells = {id_: order[start:end] for id_, start, end
+                       in zip(ids.tolist(), starts, ends)}
+
+        # islands as regions of equal ids
+        labels, n_islands = MapStatistics.label_regions(raw_map)
+        labels = labels.ravel()
+        order = np.argsort(labels, kind='stable')
+        starts = np.searchsorted(labels[order], np.arange(1, n_islands + 1))
+        ys, xs = np.divmod(order, self._shape[1])
+        self._island_cells = order
+        self._island_starts = np.append(starts, len(order))
+        self._island_boxes = np.stack([
+            np.minimum.reduceat(ys, starts), np.minimum.reduceat(xs, starts),
+            np.maximum.reduceat(ys, starts) + 1,
+            np.maximum.reduceat(xs, starts) + 1], axis=1)
+        island_ids = flat[order[starts]]
+        self._islands = {id_: np.flatnonzero(island_ids == id_)
+                         for id_ in ids.tolist()}
+
+        # block summary, blocks[by, bx, i] tells if ids[i] is in block
+        n_blocks_y = -(-self._shape[0] // block_size)
+        n_blocks_x = -(-self._shape[1] // block_size)
+        self._blocks = np.zeros((n_blocks_y, n_blocks_x, len(ids)),
+                                dtype=bool)
+        block_rows = np.arange(self._shape[0]) // block_size
+        block_columns = np.arange(self._shape[1]) // block_size
+        blocks = (block_rows[:, None] * n_blocks_x + block_columns).ravel()
+        present = np.bincount(blocks * len(ids) + np.searchsorted(ids, flat),
+                              minlength=self._blocks.size)
+        self._blocks[...] = (present > 0).reshape(self._blocks.shape)
+
+    def get_ids(self):
+        return self._ids.tolist()
+
+    def get_cells(self, id_):
+        """Returns array of coordinates (row, column) of all cells of id"""
+        return self._get_coords(self._get_id_cells(id_))
+
+    def get_cells_in_window(self, id_, y0, x0, y1, x1):
+        """Returns array of coordinates of cells of id in rectangle of rows
+        y0 to y1 and columns x0 to x1 (ends excluded)"""
+        return self._get_coords(self._get_window_cells(id_, y0, x0, y1, x1))
+
+    def count_cells_in_window(self, id_, y0, x0, y1, x1):
+        """Returns number of cells of id in rectangle"""
+        starts, ends = self._get_window_ranges(id_, y0, x0, y1, x1)
+        return int(np.sum(ends - starts))
+
+    def get_nearest_cell(self, id_, y, x):
+        """Returns coordinates of cell of id nearest (in euclidean distance)
+        to point or None if there are no cells of id"""
+        if id_ not in self._cells:
+            return None
+        position = int(np.searchsorted(self._ids, id_))
+        present = self._blocks[:, :, position]
+        size = self._block_size
+        block_y, block_x = y // size, x // size
+        last_ring = max(block_y, present.shape[0] - 1 - block_y,
+                        block_x, present.shape[1] - 1 - block_x)
+        best, best_distance = None, None
+        ring = 0
+        # cells in further rings are at least (ring - 1) * size away
+        while best is None or best_distance > ((ring - 1) * size) ** 2:
+            if ring > last_ring:
+                break
+            for by, bx in self._get_ring_blocks(block_y, block_x, ring):
+                if not present[by, bx]:
+                    continue
+                cells = self.get_cells_in_window(
+                    id_, by * size, bx * size, (by + 1) * size,
+                    (bx + 1) * size)
+                distances = (cells[:, 0] - y) ** 2 + (cells[:, 1] - x) ** 2
+                nearest = int(np.argmin(distances))
+                if best is None or distances[nearest] < best_distance:
+                    best = tuple(cells[nearest].tolist())
+                    best_distance = distances[nearest]
+            ring += 1
+        return best
+
+    def get_island_bounding_boxes(self, id_):
+        """Returns array of bounding boxes (y0, x0, y1, x1, ends excluded) of
+        all islands of id"""
+        return self._island_boxes[self._islands.get(id_, [])]
+
+    def get_island_cells(self, id_, island):
+        """Returns array of coordinates of cells of island number island
+        (position in bounding boxes array) of id"""
+        number = self._islands[id_][island]
+        start, end = self._island_starts[number:number + 2]
+        return self._get_coords(self._island_cells[start:end])
+
+    def get_ids_in_block(self, block_y, block_x):
+        """Returns list of ids present in block"""
+        return self._ids[self._blocks[block_y, block_x]].tolist()
+
+    def get_ids_in_window(self, y0, x0, y1, x1):
+        """Returns list of ids present in blocks touching rectangle"""
+        size = self._block_size
+        blocks = self._blocks[y0 // size:-(-y1 // size),
+                              x0 // size:-(-x1 // size)]
+        return self._ids[np.any(blocks, axis=(0, 1))].tolist()
+
+    def _get_id_cells(self, id_):
+        return self._cells.get(id_, np.zeros(0, dtype=int))
+
+    def _get_window_ranges(self, id_, y0, x0, y1, x1):
+        """Returns ranges of sorted cells of id in every row of rectangle"""
+        y0, x0 = max(y0, 0), max(x0, 0)
+        y1, x1 = min(y1, self._shape[0]), min(x1, self._shape[1])
+        rows = np.arange(y0, max(y0, y1)) * self._shape[1]
+        if x1 <= x0:
+            rows = rows[:0]
+        cells = self._get_id_cells(id_)
+        return (np.searchsorted(cells, rows + x0),
+                np.searchsorted(cells, rows + x1))
+
+    def _get_window_cells(self, id_, y0, x0, y1, x1):
+        starts, ends = self._get_window_ranges(id_, y0, x0, y1, x1)
+        lengths = ends - starts
+        # concatenated ranges start:end of every row
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return self._get_id_cells(id_)[offsets + np.arange(lengths.sum())]
+
+    def _get_coords(self, flat_cells):
+        return np.stack(np.divmod(flat_cells, self._shape[1]), axis=1)
+
+    def _get_ring_blocks(self, block_y, block_x, ring):
+        """Returns blocks in chebyshev distance ring from block"""
+        n_y, n_x = self._blocks.shape[:2]
+        blocks = []
+        for by in range(block_y - ring, block_y + ring + 1):
+            for bx in range(block_x - ring, block_x + ring + 1):
+                on_ring = max(abs(by - block_y), abs(bx - block_x)) == ring
+                if on_ring and 0 <= by < n_y and 0 <= bx < n_x:
+                    blocks.append((by, bx))
+        return blocks
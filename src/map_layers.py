@@ -0,0 +1,95 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from random import Random
+from zlib import crc32
+
+import numpy as np
+
+from src.generator import TileMapGenerator
+from src.sparse_layer import SparseLayer
+from src.tile_map import TileMap
+from src.tile_map_shm import TileMapAttacher, TileMapPublisher
+
+
+def generate_layer(base_map, tiles, random_seed):
+    """Generates tiles over read-only base map and returns generated cells
+    (ids different from base map) as SparseLayer. Base map is copied only
+    into buffer of generation"""
+    tile_map = TileMap(1, 1, tiles)
+    tile_map.update_map(np.array(base_map))
+    TileMapGenerator(random_seed).generate_map(tile_map)
+    raw_map = tile_map.get_map()
+    cells = np.flatnonzero(raw_map != base_map)
+    layers = [SparseLayer(raw_map.shape, cells, raw_map.reshape(-1)[cells])]
+    return SparseLayer.combine(layers + tile_map.get_sparse_layers())
+
+
+def _generate_published_layer(block_name, tiles, random_seed):
+    """Generates layer over map published in shared memory block"""
+    attacher = TileMapAttacher(block_name)
+    try:
+        layer = generate_layer(attacher.get_tile_map().get_map(), tiles,
+                               random_seed)
+    finally:
+        attacher.close()
+    return layer.get_cells(), layer.get_ids()
+
+
+class LayerGenerator:
+    """
+    LayerGenerator generates named layers of tile map concurrently. Layers
+    only read map, so in processes they are generated over map published
+    once in shared memory (TileMapPublisher) and in threads over read-only
+    view of it. Every layer has its own seed derived from random_seed and
+    layer name, so layers are the same whichever way they are generated.
+    :param workers: Number of workers, defaults to None (number of
+    processors), 1 generates layers in current thread
+    :type workers: int
+    :param random_seed: Seed of layers, defaults to None
+    :type random_seed: int
+    :param use_threads: Generate in threads instead of processes, defaults
+    to False (generation is pure python, so threads don't run in parallel)
+    :type use_threads: bool
+    """
+
+    def __init__(self, workers=None, random_seed=None, use_threads=False):
+        self._workers = workers
+        self._seed = random_seed
+        self._use_threads = use_threads
+        self._random = Random(random_seed)
+
+    def get_layer_seed(self, name):
+        if self._seed is None:
+            return self._random.randrange(2**32)
+        return crc32(f"{self._seed}:{name}".encode())
+
+    def generate_layers(self, tile_map, names=None):
+        """Generates named layers (all if names is None) of tile map"""
+        if names is None:
+            names = tile_map.get_layer_names()
+        jobs = [(name, tile_map.get_layer(name).get_tiles(),
+                 self.get_layer_seed(name)) for name in names]
+        base_map = tile_map.get_map().view()
+        base_map.flags.writeable = False
+
+        if self._workers == 1 or len(jobs) <= 1:
+            results = [generate_layer(base_map, tiles, seed)
+                       for name, tiles, seed in jobs]
+        elif self._use_threads:
+            with ThreadPoolExecutor(self._workers) as pool:
+                results = list(pool.map(
+                    lambda job: generate_layer(base_map, *job[1:]), jobs))
+        else:
+            publisher = TileMapPublisher(tile_map)
+            try:
+                with ProcessPoolExecutor(self._workers) as pool:
+                    futures = [pool.submit(_generate_published_layer,
+                                           publisher.get_name(), tiles, seed)
+                               for name, tiles, seed in jobs]
+                    results = [SparseLayer(base_map.shape, *future.result())
+                               for future in futures]
+            finally:
+                publisher.close()
+
+        for (name, tiles, seed), cells in zip(jobs, results):
+            tile_map.set_layer_cells(name, cells)
+        return tile_map
@@ -0,0 +1,285 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from os import cpu_count
+from time import perf_counter
+
+from src.generator import TileMapGenerator
+from src.tile import TileTreeNode
+from src.tile_map import TileMap
+from src.tile_map_io import TileMapIO
+
+
+CONTENT_TYPES = {'binary': 'application/octet-stream', 'png': 'image/png',
+                 'geojson': 'application/geo+json',
+                 'polygons': 'application/octet-stream'}
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+           405: 'Method Not Allowed', 413: 'Payload Too Large',
+           500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+def generate_map_data(tiles_data, size_y, size_x, random_seed, format_):
+    """Generates map in worker process and returns it encoded in format"""
+    tile_map = TileMap(size_y, size_x, TileTreeNode.from_dict(tiles_data))
+    TileMapGenerator(random_seed).generate_map(tile_map)
+    tile_map.merge_sparse_layers()
+    if format_ == 'png':
+        return TileMapIO.get_map_png(tile_map)
+    if format_ == 'geojson':
+        return TileMapIO.get_map_geojson(tile_map).encode()
+    if format_ == 'polygons':
+        return TileMapIO.get_map_polygons(tile_map)
+    return TileMapIO.get_map_binary(tile_map.get_map())
+
+
+class GenerationRequest:
+    """
+    GenerationRequest holds validated body of generation request.
+    Request body is JSON object with keys: "tiles" (tile tree as in
+    TileTreeNode.to_dict), "size" ([rows, columns]), optional "seed"
+    and optional "format" ("binary" - default, "png", "geojson" or
+    "polygons" - outlines of islands in binary form).
+    :raises: :class:'ValueError': Invalid request body
+    """
+
+    def __init__(self, body):
+        try:
+            data = json.loads(body)
+            self.tiles_data = data["tiles"]
+            self.size_y, self.size_x = (int(s) for s in data["size"])
+            self.seed = data.get("seed")
+            self.format = data.get("format", "binary")
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            raise ValueError(f"Invalid request: {e!r}")
+        if self.size_y < 1 or self.size_x < 1:
+            raise ValueError(f"Can't create map of size {self.size_y}x"
+                             f"{self.size_x}")
+        if not isinstance(self.format, str) or \
+                self.format not in CONTENT_TYPES:
+            raise ValueError(f"Unknown format {self.format!r}")
+        if self.seed is not None and not isinstance(self.seed, int):
+            raise ValueError("Seed must be integer")
+        # validates tiles before request reaches workers
+        TileTreeNode.from_dict(self.tiles_data)
+
+    def get_key(self):
+        """Returns key equal for identical requests"""
+        return json.dumps([self.tiles_data, self.size_y, self.size_x,
+                           self.seed, self.format], sort_keys=True)
+
+
+class MapGenerationService:
+    """
+    MapGenerationService is local HTTP server generating maps on process
+    pool without blocking its event loop. Identical requests that arrive
+    while the same map is generated wait for that generation instead of
+    starting new one. Requests that would exceed max_pending jobs are
+    rejected with 503 status.
+    Endpoints: POST /generate, GET /metrics.
+    :param host: Address to listen on, defaults to '127.0.0.1'
+    :type host: str
+    :param port: Port to listen on, defaults to 8080 (0 picks free port)
+    :type port: int
+    :param workers: Number of worker processes, defaults to None (number of
+    processors)
+    :type workers: int
+    :param max_pending: Maximum number of generated and queued jobs, defaults
+    to None (twice the number of workers)
+    :type max_pending: int
+    """
+
+    CHUNK_SIZE = 64 * 1024
+    MAX_BODY_SIZE = 1024 * 1024
+    LATENCY_SAMPLES = 1000
+
+    def __init__(self, host='127.0.0.1', port=8080, workers=None,
+                 max_pending=None):
+        self._host = host
+        self._port = port
+        self._workers = workers or cpu_count() or 1
+        self._max_pending = max_pending or 2 * self._workers
+        self._pool = None
+        self._server = None
+        self._jobs = {}
+        self._latencies = deque(maxlen=self.LATENCY_SAMPLES)
+        self._counters = {'requests': 0, 'generated': 0, 'coalesced': 0,
+                          'rejected': 0, 'failed': 0}
+
+    async def start(self):
+        """Starts worker pool and server, returns port server listens on"""
+        # forked workers would inherit listening and client sockets
+        self._pool = ProcessPoolExecutor(
+            max_workers=self._workers,
+            mp_context=multiprocessing.get_context('spawn'))
+        self._server = await asyncio.start_server(
+            self.handle_connection, self._host, self._port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    async def serve_forever(self, on_start=None):
+        """Serves until cancelled, on_start is called with port server
+        listens on"""
+        port = await self.start()
+        if on_start is not None:
+            on_start(port)
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    def get_metrics(self):
+        """Returns dictionary of request counters, jobs and latencies"""
+        pending = len(self._jobs)
+        latencies = sorted(self._latencies)
+        metrics = dict(self._counters)
+        metrics.update({
+            'pending': pending,
+            'running': min(pending, self._workers),
+            'queue_depth': max(0, pending - self._workers),
+            'max_pending': self._max_pending,
+        })
+        if latencies:
+            metrics.update({
+                'latency_mean': sum(latencies) / len(latencies),
+                'latency_p50': latencies[len(latencies) // 2],
+                'latency_p95': latencies[int(len(latencies) * 0.95)],
+            })
+        return metrics
+
+    async def handle_connection(self, reader, writer):
+        try:
+            status, content_type, body = await self.handle_request(reader)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+        await self.send_response(writer, status, content_type, body)
+
+    async def handle_request(self, reader):
+        """Returns status, content type and body of response"""
+        request_line = await reader.readline()
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        try:
+            method, path, _ = request_line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            return self.get_error(400, "Malformed request line")
+
+        if path == '/metrics':
+            if method != 'GET':
+                return self.get_error(405, "Use GET")
+            return 200, 'application/json', \
+                json.dumps(self.get_metrics()).encode()
+        if path != '/generate':
+            return self.get_error(404, f"Unknown path {path}")
+        if method != 'POST':
+            return self.get_error(405, "Use POST")
+
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            return self.get_error(400, "Invalid Content-Length")
+        if length < 0:
+            return self.get_error(400, "Invalid Content-Length")
+        if length > self.MAX_BODY_SIZE:
+            return self.get_error(413, "Request body too large")
+        body = await reader.readexactly(length)
+        self._counters['requests'] += 1
+        try:
+            request = GenerationRequest(body)
+        except ValueError as e:
+            return self.get_error(400, str(e))
+        return await self.generate(request)
+
+    async def generate(self, request):
+        """Runs generation job or joins identical job already running"""
+        key = request.get_key()
+        job = self._jobs.get(key)
+        if job is not None:
+            self._counters['coalesced'] += 1
+        elif len(self._jobs) >= self._max_pending:
+            self._counters['rejected'] += 1
+            return self.get_error(503, "Generation queue is full")
+        else:
+            job = asyncio.ensure_future(self.run_job(key, request))
+            self._jobs[key] = job
+        try:
+            data = await asyncio.shield(job)
+        except ValueError as e:
+            return self.get_error(400, f"Cannot generate map: {e}")
+        except Exception as e:
+            return self.get_error(500, f"Cannot generate map: {e!r}")
+        return 200, CONTENT_TYPES[request.format], data
+
+    async def run_job(self, key, request):
+        start = perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            data = await loop.run_in_executor(
+                self._pool, generate_map_data, request.tiles_data,
+                request.size_y, request.size_x, request.seed, request.format)
+            self._counters['generated'] += 1
+            return data
+        except Exception:
+            self._counters['failed'] += 1
+            raise
+        finally:
+            del self._jobs[key]
+            self._latencies.append(perf_counter() - start)
+
+    @staticmethod
+    def get_error(status, message):
+        return status, 'application/json', \
+            json.dumps({'error': message}).encode()
+
+    async def send_response(self, writer, status, content_type, body):
+        """Sends response, body is streamed in chunks"""
+        head = (f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n")
+        if status == 503:
+            head += "Retry-After: 1\r\n"
+        try:
+            writer.write((head + "\r\n").encode('latin-1'))
+            view = memoryview(body)
+            for start in range(0, len(body), self.CHUNK_SIZE):
+                writer.write(view[start:start + self.CHUNK_SIZE])
+                await writer.drain()
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tile map generation "
+                                     "service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--max-pending', type=int, default=None)
+    args = parser.parse_args()
+    service = MapGenerationService(args.host, args.port, args.workers,
+                                   args.max_pending)
+    try:
+        asyncio.run(service.serve_forever(
+            lambda port: print(f"Serving on http://{args.host}:{port}")))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import numpy as np
+
+
+class MapStatistics:
+    """
+    MapStatistics class contains vectorized methods of measuring generated
+    maps, such as finding separate islands of tiles.
+    """
+
+    SIDES = [(-1, 0), (0, 1), (0, -1), (1, 0)]
+    CORNERS = [(-1, 1), (-1, -1), (1, 1), (1, -1)]
+
+    @staticmethod
+    def label_regions(raw_map, mask=None, mode='sides'):
+        """
+        Labels connected regions of equal ids. Cells are connected if they
+        are adjacent (by sides or by all neighbours) and have the same id.
+        :param raw_map: 2D array of ids
+        :type raw_map: :class:'numpy.ndarray'
+        :param mask: Boolean array, cells outside mask get label 0
+        :type mask: :class:'numpy.ndarray'
+        :param mode: 'sides' or 'all', same as in get_adj_coords
+        :type mode: str
+        :return: Array of labels from 1 to number of regions and number of
+        regions
+        :rtype: tuple
+        """
+        raw_map = np.asarray(raw_map)
+        if mask is None:
+            mask = np.ones(raw_map.shape, dtype=bool)
+        size_y, size_x = raw_map.shape
+        n_cells = size_y * size_x
+        if n_cells == 0 or not mask.any():
+            return np.zeros(raw_map.shape, dtype=int), 0
+
+        offsets = MapStatistics.SIDES
+        if mode == 'all':
+            offsets = MapStatistics.SIDES + MapStatistics.CORNERS
+        # pairs of connected cells, every edge is checked from both ends
+        index = np.arange(n_cells).reshape(size_y, size_x)
+        pairs = []
+        for dy, dx in offsets:
+            if (dy, dx) < (0, 0):
+                continue
+            a = (slice(0, size_y - dy),
+                 slice(max(0, -dx), size_x - max(0, dx)))
+            b = (slice(dy, size_y), slice(max(0, dx), size_x + min(0, dx)))
+            connected = mask[a] & mask[b] & (raw_map[a] == raw_map[b])
+            pairs.append((index[a][connected], index[b][connected]))
+        first = np.concatenate([p[0] for p in pairs])
+        second = np.concatenate([p[1] for p in pairs])
+
+        # min label propagation with pointer jumping
+        labels = np.arange(n_cells)
+        while True:
+            lowest = np.minimum(labels[first], labels[second])
+            changed = np.any(labels[first] != lowest) or \
+                np.any(labels[second] != lowest)
+            np.minimum.at(labels, first, lowest)
+            np.minimum.at(labels, second, lowest)
+            labels = labels[labels]
+            if not changed:
+                break
+
+        labels = labels.reshape(size_y, size_x)
+        roots, labels = np.unique(
+            np.where(mask, labels, -1), return_inverse=True)
+        labels = labels.reshape(size_y, size_x)
+        if roots[0] != -1:
+            labels += 1
+        return labels, len(roots) - int(roots[0] == -1)
+
+    @staticmethod
+    def count_islands(raw_map, tile_ids, mode='sides'):
+        """Returns number of separate islands made of any of tile_ids"""
+        mask = np.isin(raw_map, list(tile_ids))
+        return MapStatistics.label_regions(mask, mask, mode)[1]
+
+    @staticmethod
+    def get_id_histogram(raw_map):
+        """Returns dictionary with number of cells of every id on map"""
+        ids, counts = np.unique(raw_map, return_counts=True)
+        return dict(zip(ids.tolist(), counts.tolist()))
+
+    @staticmethod
+    def get_subtree_counts(histogram, tiles):
+        """Returns dictionary with number of cells covered by every tile
+        together with tiles generated on it"""
+        counts = {}
+
+        def count(node):
+            total = histogram.get(node.get_tile().get_id(), 0)
+            for child in node.get_children():
+                total += count(child)
+            counts[node.get_tile().get_id()] = total
+            return total
+
+        count(tiles)
+        return counts
+
+    @staticmethod
+    def get_subtree_ids(tiles):
+        """Returns list of ids of tile and all tiles generated on it"""
+        return [id_ for id_, color in tiles.get_colors_list()]
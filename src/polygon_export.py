@@ -0,0 +1,305 @@
+import struct
+
+import numpy as np
+
+
+# magic, rows, columns, number of rings, followed by table of rings (id,
+# number of vertices, flags) and coordinates, all little endian int32
+POLYGON_HEADER = struct.Struct('<4sIII')
+POLYGON_MAGIC = b'TPOL'
+# ring is hole of last exterior ring before it
+HOLE_FLAG = 1
+# first side of ring is vertical
+VERTICAL_FLAG = 2
+
+
+class PolygonExport:
+    """
+    PolygonExport traces outlines of all islands (regions of equal ids
+    connected by sides) of tile map into polygons with holes, written as
+    GeoJSON or compact binary form. Vertices are corners of cells, x is
+    column and y is row (growing down). Exterior rings have positive signed
+    area (shoelace formula in these coordinates), holes negative.
+    Only finding boundary edges passes over whole map (two vectorized
+    comparisons), edges are chained into rings, simplified and holes are
+    matched with islands with array operations on edges, so the rest of
+    export and size of output depend on length of island boundaries, not
+    on map area.
+    :param tile_map: Exported map (with merged sparse layers)
+    :type tile_map: TileMap
+    """
+
+    def __init__(self, tile_map):
+        self._tile_map = tile_map
+        self._polygons = None
+        self._revision = None
+
+    def get_polygons(self):
+        """
+        Returns polygons of map, traced once per map revision.
+        :return: List of tuples of id and list of rings, exterior ring
+        first, then its holes. Ring is array of (x, y) vertices without
+        repeated first vertex
+        :rtype: list
+        """
+        revision = self._tile_map.get_map_revision()
+        if self._polygons is None or revision != self._revision:
+            raw_map = self._tile_map.get_map()
+            if self._tile_map.get_sparse_layers():
+                raw_map = self._tile_map.get_merged_map()
+            self._polygons = self.trace_polygons(raw_map)
+            self._revision = revision
+        return self._polygons
+
+    def get_geojson(self):
+        """Returns GeoJSON FeatureCollection with MultiPolygon feature of
+        every tile id present on map"""
+        names = dict(zip(
+            [id_ for id_, color in self._tile_map.get_tiles()
+             .get_colors_list()],
+            self._tile_map.get_tiles().get_names_list()))
+        colors = dict(self._tile_map.get_tiles().get_colors_list())
+        features = {}
+        for id_, rings in self.get_polygons():
+            if id_ not in features:
+                features[id_] = {
+                    "type": "Feature",
+                    "properties": {"id": id_, "name": names.get(id_),
+                                   "color": colors.get(id_)},
+                    "geometry": {"type": "MultiPolygon", "coordinates": []}}
+            features[id_]["geometry"]["coordinates"].append(
+                [np.vstack([ring, ring[:1]]).tolist() for ring in rings])
+        return {"type": "FeatureCollection",
+                "features": [features[id_] for id_ in sorted(features)]}
+
+    def get_binary(self):
+        """Returns polygons in compact binary form. Sides of rings are
+        alternately horizontal and vertical, so after first vertex only
+        changed coordinate of every next vertex is stored"""
+        table = []
+        coordinates = []
+        for id_, rings in self.get_polygons():
+            for number, ring in enumerate(rings):
+                vertical = ring[0, 0] == ring[1, 0]
+                table.append((id_, len(ring),
+                              HOLE_FLAG * (number > 0) +
+                              VERTICAL_FLAG * vertical))
+                changed = np.where(
+                    (np.arange(1, len(ring)) % 2 == 1) ^ vertical,
+                    ring[1:, 0], ring[1:, 1])
+                coordinates += [ring[0], changed]
+        size_y, size_x = self._tile_map.get_map().shape
+        header = POLYGON_HEADER.pack(POLYGON_MAGIC, size_y, size_x,
+                                     len(table))
+        return header + np.array(table, dtype='<i4').tobytes() + \
+            np.concatenate(coordinates or [[]]).astype('<i4').tobytes()
+
+    @staticmethod
+    def load_binary(data):
+        """
+        Reads polygons from binary form.
+        :return: Shape of map and list of polygons like get_polygons
+        :rtype: tuple
+        """
+        magic, size_y, size_x, n_rings = POLYGON_HEADER.unpack_from(data)
+        if magic != POLYGON_MAGIC:
+            raise ValueError("Data is not binary tile map polygons")
+        table = np.frombuffer(data, dtype='<i4', count=n_rings * 3,
+                              offset=POLYGON_HEADER.size).reshape(-1, 3)
+        values = np.frombuffer(data, dtype='<i4',
+                               offset=POLYGON_HEADER.size + table.nbytes)
+        polygons = []
+        offset = 0
+        for id_, length, flags in table.tolist():
+            start, changed = values[offset:offset + 2], \
+                values[offset + 2:offset + length + 1]
+            offset += length + 1
+            steps = np.arange(length)
+            changes_x = (steps % 2 == 1) ^ bool(flags & VERTICAL_FLAG)
+            ring = np.empty((length, 2), dtype=int)
+            for axis, changes in ((0, changes_x), (1, ~changes_x)):
+                vertex_values = np.concatenate([start[axis:axis + 1],
+                                                changed])
+                changes[0] = True
+                # every coordinate is kept until it changes again
+                ring[:, axis] = vertex_values[
+                    np.maximum.accumulate(np.where(changes, steps, 0))]
+            if flags & HOLE_FLAG:
+                polygons[-1][1].append(ring)
+            else:
+                polygons.append((id_, [ring]))
+        return (size_y, size_x), polygons
+
+    @staticmethod
+    def get_boundary_edges(raw_map):
+        """
+        Returns unit edges between cells of different ids, directed so that
+        their cell is on the right side when looking along edge with y
+        growing down (cells are walked clockwise on screen).
+        :return: Arrays of start x, start y, direction x, direction y, id
+        and flat index of cell of every edge
+        :rtype: tuple
+        """
+        size_y, size_x = raw_map.shape
+        padded = np.pad(raw_map, 1, mode='constant',
+                        constant_values=raw_map.min() - 1)
+        edges = []
+        # edges between rows, top side of cell below, bottom of cell above
+        horizontal = padded[:-1, 1:-1] != padded[1:, 1:-1]
+        for row_shift, start_shift, direction in ((0, 0, 1), (-1, 1, -1)):
+            rows, columns = np.nonzero(horizontal)
+            inside = (rows + row_shift >= 0) & (rows + row_shift < size_y)
+            rows, columns = rows[inside], columns[inside]
+            edges.append((columns + start_shift, rows,
+                          np.full(len(rows), direction), np.zeros_like(rows),
+                          (rows + row_shift) * size_x + columns))
+        # edges between columns, left side of cell right, right of cell left
+        vertical = padded[1:-1, :-1] != padded[1:-1, 1:]
+        for column_shift, start_shift, direction in ((0, 1, -1),
+                                                     (-1, 0, 1)):
+            rows, columns = np.nonzero(vertical)
+            inside = (columns + column_shift >= 0) & \
+                (columns + column_shift < size_x)
+            rows, columns = rows[inside], columns[inside]
+            edges.append((columns, rows + start_shift, np.zeros_like(rows),
+                          np.full(len(rows), direction),
+                          rows * size_x + columns + column_shift))
+        x, y, dx, dy, cells = (np.concatenate(parts) for parts in zip(*edges))
+        return x, y, dx, dy, raw_map.reshape(-1)[cells], cells
+
+    @staticmethod
+    def get_next_edges(x, y, dx, dy, ids, shape):
+        """Returns index of next edge of ring for every edge. Where two
+        cells of the same id touch only by corner, ring turns towards its
+        own cell, so that cells touching by corner are separate islands"""
+        _, id_ranks = np.unique(ids, return_inverse=True)
+        width = shape[1] + 1
+        starts = id_ranks * (shape[0] + 1) * width + y * width + x
+        ends = starts + dy * width + dx
+        order = np.argsort(starts, kind='stable')
+        first = np.searchsorted(starts[order], ends)
+        count = np.searchsorted(starts[order], ends, side='right') - first
+        following = order[first]
+        # corner vertex has two outgoing edges, take one turning right
+        corner = np.flatnonzero(count == 2)
+        other = order[first[corner] + 1]
+        turns = (dx[other] == -dy[corner]) & (dy[other] == dx[corner])
+        following[corner[turns]] = other[turns]
+        return following
+
+    @staticmethod
+    def get_ring_order(following):
+        """Returns ring number (lowest edge index of its cycle) and
+        position in ring of every edge, both computed by pointer jumping"""
+        n_edges = len(following)
+        rings = np.arange(n_edges)
+        jump = following.copy()
+        while True:
+            lowest = np.minimum(rings, rings[jump])
+            jump = jump[jump]
+            if np.array_equal(lowest, rings):
+                break
+            rings = lowest
+        # cut every cycle before its first edge and rank edges by distance
+        # to cut end
+        previous = np.empty(n_edges, dtype=int)
+        previous[following] = np.arange(n_edges)
+        successor = following.copy()
+        last = previous[rings == np.arange(n_edges)]
+        successor[last] = last
+        distance = np.ones(n_edges, dtype=int)
+        distance[last] = 0
+        while np.any(successor[successor] != successor):
+            distance = distance + distance[successor]
+            successor = successor[successor]
+        return rings, -distance
+
+    @staticmethod
+    def trace_polygons(raw_map):
+        """Returns polygons of all islands of map like get_polygons"""
+        raw_map = np.asarray(raw_map)
+        x, y, dx, dy, ids, cells = PolygonExport.get_boundary_edges(raw_map)
+        if len(x) == 0:
+            return []
+        following = PolygonExport.get_next_edges(x, y, dx, dy, ids,
+                                                 raw_map.shape)
+        rings, positions = PolygonExport.get_ring_order(following)
+
+        # edges continuing in the same direction add no vertex
+        previous = np.empty(len(following), dtype=int)
+        previous[following] = np.arange(len(following))
+        turn = (dx != dx[previous]) | (dy != dy[previous])
+        areas = np.bincount(rings, weights=x * (y + dy) - (x + dx) * y)
+
+        order = np.lexsort((positions, rings))
+        order = order[turn[order]]
+        ring_starts = np.flatnonzero(np.diff(rings[order], prepend=-1))
+        ring_ids = rings[order[ring_starts]]
+        exteriors = PolygonExport.get_exterior_rings(
+            rings, areas, x, dy, ids, cells, raw_map.shape)
+
+        polygons = {}
+        holes = []
+        for ring, vertices in zip(
+                ring_ids.tolist(),
+                np.split(np.stack([x[order], y[order]], axis=1),
+                         ring_starts[1:])):
+            if areas[ring] > 0:
+                polygons[ring] = (int(ids[ring]), [vertices])
+            else:
+                holes.append((exteriors[ring], vertices))
+        for ring, vertices in holes:
+            polygons[ring][1].append(vertices)
+        return [polygons[ring] for ring in sorted(polygons)]
+
+    @staticmethod
+    def get_exterior_rings(rings, areas, x, dy, ids, cells, shape):
+        """Returns exterior ring of island of every ring (indexed by ring
+        number). Left of leftmost side of hole there are cells of island
+        up to left side of first cell of their run in row. That side
+        belongs to exterior ring or to another hole, which reaches further
+        left, so following these links from every hole ends in exterior
+        ring"""
+        exteriors = np.arange(len(rings))
+        _, id_ranks = np.unique(ids, return_inverse=True)
+        keys = (id_ranks * shape[0] + cells // shape[1]) * (shape[1] + 1) + x
+        # left sides of cells, sorted by id, row and column
+        left = np.flatnonzero(dy == -1)
+        left = left[np.argsort(keys[left])]
+        # leftmost right side of cell of every hole
+        right = np.flatnonzero((dy == 1) & (areas[rings] < 0))
+        right = right[np.lexsort((x[right], rings[right]))]
+        right = right[np.diff(rings[right], prepend=-1) != 0]
+        # right side lies on column line after its cell
+        found = left[np.searchsorted(keys[left], keys[right] - 1,
+                                     side='right') - 1]
+        exteriors[rings[right]] = rings[found]
+        while True:
+            jumped = exteriors[exteriors]
+            if np.array_equal(jumped, exteriors):
+                return exteriors
+            exteriors = jumped
+
+    @staticmethod
+    def rasterize(polygons, shape, background=-1):
+        """Returns map of ids of cells inside polygons (even-odd rule, so
+        holes stay background), cells outside all polygons are
+        background"""
+        raw_map = np.full(shape, background, dtype=int)
+        sides = {}
+        for id_, rings in polygons:
+            for ring in rings:
+                end = np.roll(ring, -1, axis=0)
+                vertical = ring[:, 0] == end[:, 0]
+                sides.setdefault(id_, []).append(np.stack(
+                    [ring[vertical, 0], np.minimum(ring, end)[vertical, 1],
+                     np.maximum(ring, end)[vertical, 1]], axis=1))
+        for id_, id_sides in sides.items():
+            x, y0, y1 = np.concatenate(id_sides).T
+            # every vertical side flips cells right of it in its rows
+            flips = np.zeros((shape[0] + 1, shape[1] + 1), dtype=int)
+            np.add.at(flips, (y0, x), 1)
+            np.add.at(flips, (y1, x), 1)
+            flips = np.cumsum(np.cumsum(flips, axis=0), axis=1) % 2
+            raw_map[flips[:-1, :-1] == 1] = id_
+        return raw_map
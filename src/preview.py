@@ -0,0 +1,123 @@
+from math import ceil, floor, log
+from time import perf_counter
+
+from src.cost_model import CostModel
+from src.generator import (BudgetExceededError, GenerationAbortedError,
+                           TileMapGenerator)
+from src.tile import Tile, TileTreeNode
+from src.tile_map import TileMap
+
+
+class MapPreview:
+    """
+    MapPreview generates scaled down version of tile map fast enough to be
+    generated again every time tile settings change. Number of islands is
+    scaled with map area (but never below 1) and every tile uses coarse to
+    fine generation with refinement fitting its island size. Preview is
+    shrunk further until its estimated generation time fits time budget,
+    and generation running longer than budget is stopped, leaving tiles
+    generated until then. Estimates are corrected by ratio of measured and
+    estimated time of previous previews.
+    :param max_size: Maximum number of rows and columns, defaults to 200
+    :type max_size: int
+    :param time_budget: Generation time in seconds, defaults to 0.1
+    :type time_budget: float
+    :param random_seed: Seed of previews, defaults to 0 (the same settings
+    give the same preview)
+    :type random_seed: int
+    :param cost_model: Model used to choose size, defaults to None
+    :type cost_model: CostModel
+    """
+
+    MAX_REFINEMENT = 3
+    # coarse cells per island below which refinement is lowered
+    MIN_COARSE_CELLS = 16
+    MIN_SIZE = 16
+
+    def __init__(self, max_size=200, time_budget=0.1, random_seed=0,
+                 cost_model=None):
+        self._max_size = max_size
+        self._time_budget = time_budget
+        self._seed = random_seed
+        if cost_model is None:
+            cost_model = CostModel()
+        self._cost_model = cost_model
+        self._correction = 1.0
+
+    def generate(self, tiles, size_y, size_x):
+        """
+        Generates preview of map of tiles and size.
+        :return: Preview tile map and False if generation was stopped
+        :rtype: tuple
+        """
+        preview_tiles, preview_y, preview_x = self.get_preview(
+            tiles, size_y, size_x)
+        tile_map = TileMap(preview_y, preview_x, preview_tiles)
+        # budget is checked only by deadline, size already fits estimate
+        generator = TileMapGenerator(self._seed, self._time_budget,
+                                     cost_model=self._get_corrected_model())
+        estimate = self._cost_model.estimate(preview_tiles, preview_y,
+                                             preview_x)['seconds']
+        start = perf_counter()
+        try:
+            generator.generate_map(tile_map)
+        except (BudgetExceededError, GenerationAbortedError):
+            self._correction *= 2
+            return tile_map, False
+        if estimate > 0:
+            self._correction = (perf_counter() - start) / estimate
+        tile_map.merge_sparse_layers()
+        return tile_map, True
+
+    def _get_corrected_model(self):
+        calibration = self._cost_model.get_calibration()
+        return CostModel({key: value * self._correction
+                          for key, value in calibration.items()
+                          if key.endswith('_seconds')})
+
+    def get_preview(self, tiles, size_y, size_x):
+        """Returns scaled tiles and size of preview"""
+        scale = min(1, self._max_size / max(size_y, size_x))
+        while True:
+            preview_y = max(1, ceil(size_y * scale))
+            preview_x = max(1, ceil(size_x * scale))
+            preview_tiles = self.get_preview_tiles(
+                tiles, (preview_y * preview_x) / (size_y * size_x),
+                preview_y * preview_x)
+            estimate = self._cost_model.estimate(preview_tiles, preview_y,
+                                                 preview_x)
+            if estimate['seconds'] * self._correction <= \
+                    self._time_budget or \
+                    max(preview_y, preview_x) <= self.MIN_SIZE:
+                return preview_tiles, preview_y, preview_x
+            scale *= 0.8
+
+    @staticmethod
+    def get_preview_tiles(tiles, area_scale, area):
+        """Returns copy of tile tree with number of islands scaled by
+        area_scale and refinement chosen for expected island size on map
+        of area"""
+        def copy(tile, node, parent_cells):
+            children = []
+            for child in node.get_children():
+                child_tile = child.get_tile()
+                islands = max(1, round(child_tile.get_islands() * area_scale))
+                cells = floor(parent_cells * child_tile.get_fill())
+                preview_tile = Tile(
+                    child_tile.get_id(), child_tile.get_name(),
+                    child_tile.get_color(), child_tile.get_fill(), islands,
+                    MapPreview.get_refinement(cells / islands),
+                    child_tile.is_sparse())
+                children.append(copy(preview_tile, child, cells))
+                parent_cells -= cells
+            return TileTreeNode(tile, children)
+        return copy(tiles.get_tile(), tiles, area)
+
+    @staticmethod
+    def get_refinement(island_cells):
+        """Returns highest refinement leaving enough coarse cells for
+        island"""
+        if island_cells < MapPreview.MIN_COARSE_CELLS * 4:
+            return 0
+        return min(MapPreview.MAX_REFINEMENT,
+                   floor(log(island_cells / MapPreview.MIN_COARSE_CELLS, 4)))
@@ -0,0 +1,105 @@
+import numpy as np
+
+
+class SparseLayer:
+    """
+    SparseLayer stores ids of small part of map cells as sorted flat indices
+    (row * width + column) and ids of these cells, so memory depends on
+    number of stored cells instead of map area. It is used for detail tiles
+    with low fill, which are merged into dense map only when needed. Layer
+    can also be written as runs of equal ids in rows (RLE).
+    :param shape: Shape of map
+    :type shape: tuple
+    :param cells: Flat indices of cells, if cell is repeated its last id is
+    kept
+    :type cells: :class:'numpy.ndarray'
+    :param ids: Ids of cells
+    :type ids: :class:'numpy.ndarray'
+    """
+
+    def __init__(self, shape, cells=(), ids=()):
+        cells = np.asarray(cells, dtype=np.int64).ravel()
+        ids = np.asarray(ids, dtype=np.int64).ravel()
+        if len(cells) != len(ids):
+            raise ValueError("Number of cells and ids must be equal")
+        if len(cells) and (cells.min() < 0 or
+                           cells.max() >= shape[0] * shape[1]):
+            raise ValueError(f"Cells out of map of shape {tuple(shape)}")
+        order = np.argsort(cells, kind='stable')
+        cells, ids = cells[order], ids[order]
+        last = np.ones(len(cells), dtype=bool)
+        last[:-1] = cells[1:] != cells[:-1]
+        self._shape = tuple(shape)
+        self._cells = cells[last]
+        self._ids = ids[last]
+
+    def __len__(self):
+        return len(self._cells)
+
+    def get_shape(self):
+        return self._shape
+
+    def get_cells(self):
+        return self._cells
+
+    def get_ids(self):
+        return self._ids
+
+    def get_id_cells(self, id_):
+        """Returns sorted flat indices of cells of id"""
+        return self._cells[self._ids == id_]
+
+    def get_coordinates(self):
+        """Returns array of coordinates (row, column) of stored cells"""
+        return np.stack(np.divmod(self._cells, self._shape[1]), axis=1)
+
+    def get_bounding_box(self):
+        """Returns region (y0, x0, y1, x1, ends excluded) containing all
+        cells or None if layer is empty"""
+        if len(self._cells) == 0:
+            return None
+        rows, columns = np.divmod(self._cells, self._shape[1])
+        return (int(rows[0]), int(columns.min()),
+                int(rows[-1]) + 1, int(columns.max()) + 1)
+
+    def merge_into(self, raw_map):
+        """Writes ids of layer cells into dense map of layer shape"""
+        if raw_map.shape != self._shape:
+            raise ValueError(f"Can't merge layer of shape {self._shape} "
+                             f"into map of shape {raw_map.shape}")
+        raw_map[np.divmod(self._cells, self._shape[1])] = self._ids
+        return raw_map
+
+    def get_rle_rows(self):
+        """Returns arrays of rows, first columns, lengths and ids of runs of
+        cells with equal ids next to each other in row"""
+        rows, columns = np.divmod(self._cells, self._shape[1])
+        new_run = np.ones(len(self._cells), dtype=bool)
+        new_run[1:] = (np.diff(self._cells) != 1) | (np.diff(rows) != 0) | \
+            (self._ids[1:] != self._ids[:-1])
+        starts = np.flatnonzero(new_run)
+        lengths = np.diff(np.append(starts, len(self._cells)))
+        return rows[starts], columns[starts], lengths, self._ids[starts]
+
+    @staticmethod
+    def from_rle_rows(shape, rows, columns, lengths, ids):
+        """Creates layer from runs returned by get_rle_rows"""
+        lengths = np.asarray(lengths, dtype=np.int64)
+        starts = np.asarray(rows, dtype=np.int64) * shape[1] + columns
+        run_offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        cells = np.repeat(starts, lengths) + \
+            np.arange(lengths.sum()) - run_offsets
+        return SparseLayer(shape, cells, np.repeat(ids, lengths))
+
+    @staticmethod
+    def combine(layers):
+        """Returns single layer of layers of the same shape, later layers
+        override cells of earlier ones"""
+        layers = list(layers)
+        if not layers:
+            raise ValueError("No layers to combine")
+        return SparseLayer(layers[0].get_shape(),
+                           np.concatenate([layer.get_cells()
+                                           for layer in layers]),
+                           np.concatenate([layer.get_ids()
+                                           for layer in layers]))
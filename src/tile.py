@@ -13,12 +13,26 @@ class Tile:
     :type fill: float
     :param islands: Number of separate bodies of this tile type
     :type islands: int
+    :param refinement: Level of coarse to fine generation, islands are first
+    generated on map downsampled 2**refinement times, 0 generates every cell
+    directly
+    :type refinement: int
+    :param sparse: Generate tile and its children as sparse layer (sorted
+    list of cells) instead of on dense map, meant for detail tiles with low
+    fill. Sparse tiles are generated after their dense siblings.
+    :type sparse: bool
 
     :raises: :class:'ValueError': Fill value must be from range of 0 to 1
     :raises: :class:'ValueError': ID cannot be negative number
+    :raises: :class:'ValueError': Refinement cannot be negative number
     """
 
-    def __init__(self, id_, name, color, fill=0.2, islands=1):
+    # defaults for tiles pickled before refinement and sparse were introduced
+    _refinement = 0
+    _sparse = False
+
+    def __init__(self, id_, name, color, fill=0.2, islands=1, refinement=0,
+                 sparse=False):
         if id_ < 0:
             raise ValueError("ID cannot be negative number")
         self._id = id_
@@ -28,6 +42,10 @@ class Tile:
             raise ValueError("Fill value must be from range of 0 to 1")
         self._fill = fill
         self._islands = islands
+        if refinement < 0:
+            raise ValueError("Refinement cannot be negative number")
+        self._refinement = refinement
+        self._sparse = sparse
 
     def get_id(self):
         return self._id
@@ -44,6 +62,12 @@ class Tile:
     def get_islands(self):
         return self._islands
 
+    def get_refinement(self):
+        return self._refinement
+
+    def is_sparse(self):
+        return self._sparse
+
     def get_info(self):
         """Returns string with basic tile information"""
         return f"{self._id}, {self._name} - color: {self._color}, " + \
@@ -84,6 +108,35 @@ class TileTreeNode:
             names += child.get_names_list()
         return names
 
+    def to_dict(self):
+        """Returns tile tree as nested dictionaries (e.g. to save as JSON)"""
+        tile = self.get_tile()
+        return {"id": tile.get_id(), "name": tile.get_name(),
+                "color": tile.get_color(), "fill": tile.get_fill(),
+                "islands": tile.get_islands(),
+                "refinement": tile.get_refinement(),
+                "sparse": tile.is_sparse(),
+                "children": [child.to_dict() for child in self._children]}
+
+    @staticmethod
+    def from_dict(data):
+        """
+        Creates tile tree from nested dictionaries made by to_dict. Only id,
+        name and color are required.
+        :raises: :class:'ValueError': Missing or invalid tile data
+        """
+        try:
+            tile = Tile(int(data["id"]), str(data["name"]),
+                        str(data["color"]), float(data.get("fill", 0.2)),
+                        int(data.get("islands", 1)),
+                        int(data.get("refinement", 0)),
+                        bool(data.get("sparse", False)))
+            children = [TileTreeNode.from_dict(child)
+                        for child in data.get("children", [])]
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"Invalid tile data: {e!r}")
+        return TileTreeNode(tile, children)
+
     def get_id_color_tuple(self):
         tile = self.get_tile()
         return (tile.get_id(), tile.get_color())
@@ -6,12 +6,20 @@ from src.tile import TileTreeNode
 class TileMap:
     """
     TileMap object stores 2D array of ids and tiles data corresponding to it.
+    Every change of map or tiles increases its revision, changes of map
+    can be limited to regions so that only they are processed again
+    (e.g. rendered). Sparse tiles are kept in sparse layers until they are
+    merged into map. Named layers (TileMapLayer) hold independent tile trees
+    generated on top of map, they never change map itself.
     :param tiles:
     :type tiles: :class:'tile.Tile'
     :param map:
     :type map: :class:'numpy.ndarray'
     """
 
+    # number of dirty regions kept before whole map is marked dirty
+    MAX_DIRTY_REGIONS = 1024
+
     def __init__(self, size_y, size_x, tiles):
         """
         Constructor method takes sizes of map as parameters and creates
@@ -25,14 +33,144 @@ class TileMap:
         self._tiles = tiles
         self._map = np.full_like(
             self._map, self.get_background_tile_id())
+        self._map_revision = 0
+        self._tiles_revision = 0
+        self._full_update_revision = 0
+        self._dirty_regions = []
+        self._sparse_layers = []
+        self._layers = {}
+
+    def __setstate__(self, state):
+        """Sets revisions of maps pickled before they were introduced"""
+        self.__dict__.update(state)
+        self.__dict__.setdefault('_map_revision', 0)
+        self.__dict__.setdefault('_tiles_revision', 0)
+        self.__dict__.setdefault('_full_update_revision', 0)
+        self.__dict__.setdefault('_dirty_regions', [])
+        self.__dict__.setdefault('_sparse_layers', [])
+        self.__dict__.setdefault('_layers', {})
 
-    def update_map(self, raw_map):
-        """Replaces map array with new one without changing tiles list."""
+    def update_map(self, raw_map, region=None):
+        """Replaces map array with new one without changing tiles list.
+        If only region (y0, x0, y1, x1, ends excluded) of map has changed
+        it can be passed to mark only this region dirty."""
         self._map = raw_map
+        self.mark_dirty(region)
 
     def update_tiles(self, new_tiles):
         """Replaces map tiles definitions without changing map."""
         self._tiles = new_tiles
+        self._tiles_revision += 1
+
+    def mark_dirty(self, region=None):
+        """Marks region (y0, x0, y1, x1, ends excluded) of map as changed,
+        whole map is marked if region is None"""
+        self._map_revision += 1
+        if region is None or \
+                len(self._dirty_regions) >= self.MAX_DIRTY_REGIONS:
+            self._full_update_revision = self._map_revision
+            self._dirty_regions = []
+        else:
+            self._dirty_regions.append((self._map_revision, tuple(region)))
+
+    def get_dirty_regions(self, since_revision):
+        """Returns list of regions changed after since_revision or None if
+        whole map could have changed"""
+        if self._full_update_revision > since_revision:
+            return None
+        return [region for revision, region in self._dirty_regions
+                if revision > since_revision]
+
+    def set_sparse_layers(self, layers):
+        """Replaces sparse layers (list of SparseLayer) of map"""
+        self._sparse_layers = list(layers)
+
+    def get_sparse_layers(self):
+        return list(self._sparse_layers)
+
+    def merge_sparse_layers(self):
+        """Writes sparse layers into map, marks their cells dirty and
+        removes layers"""
+        for layer in self._sparse_layers:
+            region = layer.get_bounding_box()
+            if region is not None:
+                layer.merge_into(self._map)
+                self.mark_dirty(region)
+        self._sparse_layers = []
+
+    def get_merged_map(self):
+        """Returns copy of map with sparse layers merged into it"""
+        raw_map = self._map.copy()
+        for layer in self._sparse_layers:
+            layer.merge_into(raw_map)
+        return raw_map
+
+    def add_layer(self, name, tiles):
+        """Adds named layer of tiles growing on cells of map with id of
+        root tile of tiles. Ids of other tiles must not be used by map or
+        other layers.
+        :raises: :class:'ValueError': Name or tile ids are already used
+        """
+        if name in self._layers:
+            raise ValueError(f"Layer {name!r} already exists")
+        used = {id_ for id_, color in self._tiles.get_colors_list()}
+        for layer in self._layers.values():
+            used.update(id_ for id_, color
+                        in layer.get_tiles().get_colors_list())
+        layer_ids = {id_ for id_, color in tiles.get_colors_list()[1:]}
+        if used & layer_ids:
+            raise ValueError(f"Tile ids {sorted(used & layer_ids)} of layer "
+                             f"{name!r} are already used")
+        self._layers[name] = TileMapLayer(name, tiles)
+        return self._layers[name]
+
+    def get_layer(self, name):
+        return self._layers[name]
+
+    def get_layer_names(self):
+        return list(self._layers)
+
+    def remove_layer(self, name):
+        layer = self._layers.pop(name)
+        if layer.get_cells() is not None and len(layer.get_cells()):
+            self.mark_dirty(layer.get_cells().get_bounding_box())
+
+    def set_layer_cells(self, name, cells):
+        """Sets generated cells (SparseLayer) of named layer and marks them
+        dirty"""
+        layer = self._layers[name]
+        for changed in (layer.get_cells(), cells):
+            if changed is not None and len(changed):
+                self.mark_dirty(changed.get_bounding_box())
+        layer.set_cells(cells)
+
+    def select_layers(self, names):
+        """Returns TileMap sharing map array with this one (not copied),
+        with only named layers, e.g. to save only some of layers"""
+        selected = TileMap.__new__(TileMap)
+        selected.__dict__.update(self.__dict__)
+        selected._layers = {name: self._layers[name] for name in names}
+        selected._dirty_regions = list(self._dirty_regions)
+        selected._sparse_layers = list(self._sparse_layers)
+        return selected
+
+    def get_composited_map(self, names=None):
+        """Returns copy of map with sparse layers and generated cells of
+        named layers (all if names is None) written over it in order"""
+        raw_map = self.get_merged_map()
+        if names is None:
+            names = self.get_layer_names()
+        for name in names:
+            cells = self._layers[name].get_cells()
+            if cells is not None:
+                cells.merge_into(raw_map)
+        return raw_map
+
+    def get_map_revision(self):
+        return self._map_revision
+
+    def get_tiles_revision(self):
+        return self._tiles_revision
 
     def get_map(self):
         return self._map
@@ -42,3 +180,36 @@ class TileMap:
 
     def get_background_tile_id(self):
         return self._tiles.get_tile().get_id()
+
+
+class TileMapLayer:
+    """
+    TileMapLayer is named tile tree generated over TileMap. Root tile of
+    tree is id of map cells on which layer grows. Only cells generated by
+    layer are stored (as SparseLayer), map itself is shared.
+    :param name: Name of layer
+    :type name: str
+    :param tiles: Tiles of layer
+    :type tiles: TileTreeNode
+    """
+
+    def __init__(self, name, tiles):
+        if not isinstance(tiles, TileTreeNode):
+            raise TypeError(f"Expected TileTreeNode type but got{type(tiles)}")
+        self._name = name
+        self._tiles = tiles
+        self._cells = None
+
+    def get_name(self):
+        return self._name
+
+    def get_tiles(self):
+        return self._tiles
+
+    def get_cells(self):
+        """Returns SparseLayer of generated cells or None if layer wasn't
+        generated yet"""
+        return self._cells
+
+    def set_cells(self, cells):
+        self._cells = cells
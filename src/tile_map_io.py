@@ -1,7 +1,18 @@
+import json
 import pickle
 import os
+import struct
+from io import BytesIO
+
+import numpy as np
 
 import src.visualisation as tmv
+from src.polygon_export import PolygonExport
+
+
+# magic, rows, columns, followed by ids as little endian int32
+BINARY_HEADER = struct.Struct('<4sII')
+BINARY_MAGIC = b'TMAP'
 
 
 class TileMapIO:
@@ -23,11 +34,14 @@ class TileMapIO:
         print(tmv.get_string_map_representation(map_))
 
     @staticmethod
-    def save_map_to_file(map_, path):
+    def save_map_to_file(map_, path, layers=None):
+        """Saves map with named layers (all if layers is None)"""
         if len(path) == 0:
             return
         if os.path.splitext(path)[1] != '.pickle':
             path += '.pickle'
+        if layers is not None:
+            map_ = map_.select_layers(layers)
 
         with open(path, "wb") as f:
             pickle.dump(map_, f)
@@ -39,3 +53,43 @@ class TileMapIO:
         with open(path, "rb") as pickle_in:
             map_ = pickle.load(pickle_in)
         return map_
+
+    @staticmethod
+    def get_map_binary(raw_map):
+        """Returns map of ids in compact binary form"""
+        header = BINARY_HEADER.pack(BINARY_MAGIC, *raw_map.shape)
+        return header + np.ascontiguousarray(raw_map, dtype='<i4').tobytes()
+
+    @staticmethod
+    def load_map_from_binary(data):
+        """Returns map of ids (read-only view of data) from binary form"""
+        magic, rows, columns = BINARY_HEADER.unpack_from(data)
+        if magic != BINARY_MAGIC:
+            raise ValueError("Data is not binary tile map")
+        return np.frombuffer(data, dtype='<i4', count=rows * columns,
+                             offset=BINARY_HEADER.size).reshape(rows, columns)
+
+    @staticmethod
+    def get_map_png(tile_map, tile_size=10, layers=()):
+        """Returns image of map with named layers drawn over it encoded as
+        PNG"""
+        output = BytesIO()
+        tmv.TileMapVisualisation.get_map_image(
+            tile_map, tile_size, layers).save(output, format='PNG')
+        return output.getvalue()
+
+    @staticmethod
+    def get_map_geojson(tile_map):
+        """Returns outlines of islands of map as GeoJSON"""
+        return json.dumps(PolygonExport(tile_map).get_geojson())
+
+    @staticmethod
+    def get_map_polygons(tile_map):
+        """Returns outlines of islands of map in compact binary form"""
+        return PolygonExport(tile_map).get_binary()
+
+    @staticmethod
+    def load_polygons_from_binary(data):
+        """Returns shape of map and polygons of islands from binary form
+        (see PolygonExport.get_polygons)"""
+        return PolygonExport.load_binary(data)
@@ -0,0 +1,172 @@
+import pickle
+import struct
+from multiprocessing import resource_tracker, shared_memory
+from time import monotonic, sleep
+
+import numpy as np
+
+from src.tile_map import TileMap
+
+
+# magic, version, rows, columns, dtype, metadata capacity, metadata length
+HEADER = struct.Struct('<8sQqq16sQQ')
+MAGIC = b'TILEMAP1'
+ALIGNMENT = 64
+
+
+def _get_array_offset(meta_capacity):
+    offset = HEADER.size + meta_capacity
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class TileMapPublisher:
+    """
+    TileMapPublisher places map of ids and tiles data of TileMap in shared
+    memory block so other processes can attach to it without copying.
+    Version counter stored in block is odd while map is being written and
+    grows with every update.
+    :param tile_map: Published map
+    :type tile_map: TileMap
+    :param name: Name of shared memory block, defaults to None (random name)
+    :type name: str
+    :param meta_capacity: Bytes reserved for pickled tiles data, defaults to
+    None (twice the size of current tiles data, at least 4 KiB)
+    :type meta_capacity: int
+    """
+
+    def __init__(self, tile_map, name=None, meta_capacity=None):
+        raw_map = tile_map.get_map()
+        meta = pickle.dumps(tile_map.get_tiles())
+        if meta_capacity is None:
+            meta_capacity = max(2 * len(meta), 4096)
+        self._shape = raw_map.shape
+        self._dtype = raw_map.dtype
+        self._meta_capacity = meta_capacity
+        offset = _get_array_offset(meta_capacity)
+        self._shm = shared_memory.SharedMemory(
+            name=name, create=True, size=offset + raw_map.nbytes)
+        self._array = np.ndarray(self._shape, dtype=self._dtype,
+                                 buffer=self._shm.buf, offset=offset)
+        self._version = 0
+        self.update(tile_map)
+
+    def get_name(self):
+        return self._shm.name
+
+    def get_version(self):
+        return self._version
+
+    def update(self, tile_map):
+        """Writes new map into shared block. Map must have the same shape
+        and type of ids as first published map"""
+        raw_map = tile_map.get_map()
+        if raw_map.shape != self._shape or raw_map.dtype != self._dtype:
+            raise ValueError(
+                f"Can't publish map of shape {raw_map.shape} and type "
+                f"{raw_map.dtype} in block of shape {self._shape} and type "
+                f"{self._dtype}")
+        meta = pickle.dumps(tile_map.get_tiles())
+        if len(meta) > self._meta_capacity:
+            raise ValueError("Tiles data exceeds reserved metadata capacity")
+
+        self._write_header(self._version + 1, 0)
+        np.copyto(self._array, raw_map)
+        self._shm.buf[HEADER.size:HEADER.size + len(meta)] = meta
+        self._version += 2
+        self._write_header(self._version, len(meta))
+
+    def close(self):
+        """Releases and removes shared block"""
+        self._array = None
+        self._shm.close()
+        # attacher sharing resource tracker with this process could have
+        # unregistered the block, unlink expects it to be registered
+        resource_tracker.register(self._shm._name, 'shared_memory')
+        self._shm.unlink()
+
+    def _write_header(self, version, meta_len):
+        HEADER.pack_into(self._shm.buf, 0, MAGIC, version, self._shape[0],
+                         self._shape[1], self._dtype.str.encode(),
+                         self._meta_capacity, meta_len)
+
+
+class TileMapAttacher:
+    """
+    TileMapAttacher gives read-only TileMap views of map published by
+    TileMapPublisher, possibly in other process. Views share memory with the
+    block, so they see every update, and must be dropped before close.
+    Version check protects only reading of tiles data. Map array is live
+    view, so map read during update can be mix of old and new map - check
+    has_changed after reading map to detect that.
+    :param name: Name of shared memory block
+    :type name: str
+    :param timeout: Seconds to wait for update in progress to finish,
+    defaults to 5
+    :type timeout: float
+
+    :raises: :class:'ValueError': Block does not contain published map
+    """
+
+    def __init__(self, name, timeout=5):
+        self._timeout = timeout
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # before Python 3.13 attaching registers block for removal when
+            # this process ends, but block belongs to publisher
+            self._shm = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(self._shm._name, 'shared_memory')
+        if bytes(self._shm.buf[:len(MAGIC)]) != MAGIC:
+            self._shm.close()
+            raise ValueError(f"Shared block {name} doesn't contain tile map")
+        self._seen_version = None
+
+    def get_version(self):
+        return self._read_header()[1]
+
+    def has_changed(self):
+        """Checks if map was updated since last get_tile_map call"""
+        return self.get_version() != self._seen_version
+
+    def get_tile_map(self):
+        """
+        Returns read-only TileMap sharing map of ids with the block
+        :raises: :class:'TimeoutError': Update did not finish before timeout
+        (e.g. publisher died while writing)
+        """
+        deadline = monotonic() + self._timeout
+        delay = 0.0001
+        while True:
+            header = self._read_header()
+            version = header[1]
+            rows, columns, dtype, meta_capacity, meta_len = header[2:]
+            if version % 2 == 0:
+                try:
+                    tiles = pickle.loads(
+                        self._shm.buf[HEADER.size:HEADER.size + meta_len])
+                except Exception:
+                    # tiles data was rewritten while reading
+                    tiles = None
+                if tiles is not None and self.get_version() == version:
+                    break
+            if monotonic() > deadline:
+                raise TimeoutError(
+                    f"Map in block {self._shm.name} is still being updated")
+            sleep(delay)
+            delay = min(delay * 2, 0.05)
+
+        raw_map = np.ndarray(
+            (rows, columns), dtype=np.dtype(dtype.rstrip(b'\0').decode()),
+            buffer=self._shm.buf, offset=_get_array_offset(meta_capacity))
+        raw_map.flags.writeable = False
+        tile_map = TileMap(1, 1, tiles)
+        tile_map.update_map(raw_map)
+        self._seen_version = version
+        return tile_map
+
+    def close(self):
+        """Detaches from shared block"""
+        self._shm.close()
+
+    def _read_header(self):
+        return HEADER.unpack_from(self._shm.buf, 0)
@@ -0,0 +1,88 @@
+import os
+
+import numpy as np
+
+from src.generator import TileMapGenerator
+from src.tile_map import TileMap
+from src.visualisation import TileMapRenderCache
+
+
+class TimelapseEncoder:
+    """
+    TimelapseEncoder turns stream of generation changes (see
+    TileMapGenerator.generate_map delta_callback) into frames of map
+    growing. Changes are applied to single copy of starting map and only
+    changed regions of frame image are rendered again, so memory doesn't
+    depend on number of frames.
+    :param tile_map: Map before generation, it is copied once
+    :type tile_map: TileMap
+    :param tile_size: Size of single tile in pixels, defaults to 10
+    :type tile_size: int
+    """
+
+    def __init__(self, tile_map, tile_size=10):
+        self._tile_map = TileMap(1, 1, tile_map.get_tiles())
+        self._tile_map.update_map(tile_map.get_map().copy())
+        self._render_cache = TileMapRenderCache(self._tile_map, tile_size)
+        self._frames = 0
+
+    def get_tile_map(self):
+        return self._tile_map
+
+    def get_frame_count(self):
+        return self._frames
+
+    def apply_delta(self, cells, ids):
+        """Applies batch of changed cells (flat indices) to map and marks
+        their bounding box dirty"""
+        if len(cells) == 0:
+            return
+        raw_map = self._tile_map.get_map()
+        raw_map.reshape(-1)[cells] = ids
+        rows, columns = np.divmod(cells, raw_map.shape[1])
+        self._tile_map.mark_dirty((int(rows.min()), int(columns.min()),
+                                   int(rows.max()) + 1,
+                                   int(columns.max()) + 1))
+
+    def get_frame(self):
+        """Returns image of current map. Image is reused by next frames,
+        so it has to be copied to be kept"""
+        self._frames += 1
+        return self._render_cache.get_map_image()
+
+    def save_frames(self, deltas, directory, prefix='frame'):
+        """Applies every batch from deltas iterable and saves frame after
+        it as numbered PNG file. First frame shows map before generation.
+        Returns number of saved frames"""
+        os.makedirs(directory, exist_ok=True)
+        saved = 0
+        for frame in self.iter_frames(deltas):
+            frame.save(os.path.join(directory, f"{prefix}_{saved:06d}.png"))
+            saved += 1
+        return saved
+
+    def save_animation(self, deltas, path, duration=50):
+        """Saves animated GIF or APNG (chosen by path extension). Unlike
+        numbered PNGs, Pillow keeps every frame in memory until file is
+        written, so it is meant for small maps or large batches"""
+        frames = self.iter_frames(deltas)
+        first = next(frames).copy()
+        first.save(path, save_all=True, duration=duration, loop=0,
+                   append_images=(frame.copy() for frame in frames))
+
+    def iter_frames(self, deltas):
+        """Yields frame before generation and after every batch"""
+        yield self.get_frame()
+        for cells, ids in deltas:
+            self.apply_delta(cells, ids)
+            yield self.get_frame()
+
+    @staticmethod
+    def generate_frames(tile_map, directory, random_seed=None,
+                        delta_batch=1000, tile_size=10):
+        """Generates tile map saving numbered PNG frame every delta_batch
+        changed cells. Returns number of saved frames"""
+        encoder = TimelapseEncoder(tile_map, tile_size)
+        generator = TileMapGenerator(random_seed)
+        return encoder.save_frames(
+            generator.iter_deltas(tile_map, delta_batch), directory)
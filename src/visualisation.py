@@ -1,4 +1,5 @@
-from PIL import Image, ImageDraw
+import numpy as np
+from PIL import Image, ImageColor
 
 
 class TileMapVisualisation():
@@ -40,26 +41,179 @@ class TileMapVisualisation():
         return p_map
 
     @staticmethod
-    def get_map_image(tile_map, tile_size=10):
-        """Returns PIL.Image object of tile map"""
-        raw_map = tile_map.get_map()
-        tiles = tile_map.get_tiles()
-
-        map_shape = raw_map.shape
-        size = (map_shape[1]*tile_size, map_shape[0]*tile_size)
-        map_image = Image.new('RGB', size)
-
-        fill_colors = {}
-        for id_color_tuple in tiles.get_colors_list():
-            fill_colors[id_color_tuple[0]] = id_color_tuple[1]
-
-        for row_number, row in enumerate(raw_map):
-            for column_number, id_ in enumerate(row):
-                # white color if tile data is missing
-                fill_color = fill_colors.get(id_, 'white')
-                ImageDraw.Draw(map_image).rectangle([
-                    (column_number*tile_size, row_number*tile_size),
-                    ((column_number+1)*tile_size, (row_number+1)*tile_size)],
-                    outline='#000', fill=fill_color)
-
-        return map_image
+    def get_map_image(tile_map, tile_size=10, layers=()):
+        """Returns PIL.Image object (RGB) of tile map with named layers
+        drawn over it"""
+        return TileMapRenderCache(
+            tile_map, tile_size, layers).get_map_image().convert('RGB')
+
+
+class TileMapRenderCache:
+    """
+    TileMapRenderCache keeps last rendered image of tile map and renders
+    again only regions marked dirty in map since last render. Image uses
+    palette of tile colors, so change of colors only replaces palette.
+    Maps with more ids than palette slots are rendered whole as RGB images.
+    Named layers are drawn over map in given order, only rendered regions
+    of map are copied to draw them.
+    :param tile_map: Rendered map
+    :type tile_map: TileMap
+    :param tile_size: Size of single tile in pixels, defaults to 10
+    :type tile_size: int
+    :param layers: Names of layers of map to draw, defaults to none
+    :type layers: list
+    """
+
+    OUTLINE_SLOT = 0
+    MISSING_SLOT = 1  # white color if tile data is missing
+    MAX_SLOTS = 256
+
+    def __init__(self, tile_map, tile_size=10, layers=()):
+        self._tile_map = tile_map
+        self._tile_size = tile_size
+        self._layers = list(layers)
+        self._image = None
+        self._slots = {}
+        self._map_revision = None
+        self._tiles_revision = None
+
+    def get_tile_map(self):
+        return self._tile_map
+
+    def get_map_image(self):
+        """Returns PIL.Image object of tile map, rendering only regions
+        changed since last call"""
+        tile_map = self._tile_map
+        revision = tile_map.get_map_revision()
+        if self._image is None or self._map_revision is None:
+            self.render()
+        elif revision != self._map_revision:
+            regions = tile_map.get_dirty_regions(self._map_revision)
+            if regions is None or not self.render_regions(regions):
+                self.render()
+        self._map_revision = revision
+
+        if tile_map.get_tiles_revision() != self._tiles_revision:
+            if self._image.mode == 'P':
+                self.update_palette()
+            else:
+                self.render()
+        return self._image
+
+    def get_section(self, y0, x0, y1, x1):
+        """Returns region of map with layers drawn over it"""
+        raw_map = self._tile_map.get_map()
+        section = raw_map[y0:y1, x0:x1]
+        if not self._layers:
+            return section
+        section = section.copy()
+        width = raw_map.shape[1]
+        for name in self._layers:
+            layer = self._tile_map.get_layer(name).get_cells()
+            if layer is None:
+                continue
+            cells, ids = layer.get_cells(), layer.get_ids()
+            start, end = np.searchsorted(cells, [y0 * width, y1 * width])
+            rows, columns = np.divmod(cells[start:end], width)
+            inside = (columns >= x0) & (columns < x1)
+            section[rows[inside] - y0, columns[inside] - x0] = \
+                ids[start:end][inside]
+        return section
+
+    def get_colors(self):
+        """Returns dictionary of colors of ids of map and drawn layers"""
+        colors = dict(self._tile_map.get_tiles().get_colors_list())
+        for name in self._layers:
+            colors.update(self._tile_map.get_layer(name).get_tiles()
+                          .get_colors_list()[1:])
+        return colors
+
+    def render(self):
+        """Renders whole map"""
+        raw_map = self.get_section(0, 0, *self._tile_map.get_map().shape)
+        self._slots = {}
+        if not self.assign_slots(np.unique(raw_map)):
+            self.render_rgb()
+            return
+        size = (raw_map.shape[1] * self._tile_size,
+                raw_map.shape[0] * self._tile_size)
+        self._image = Image.new('P', size)
+        self.render_regions([(0, 0, raw_map.shape[0], raw_map.shape[1])])
+        self.update_palette()
+
+    def render_rgb(self):
+        """Renders whole map as RGB image, used when ids don't fit in
+        palette"""
+        raw_map = self.get_section(0, 0, *self._tile_map.get_map().shape)
+        ids, cells = np.unique(raw_map, return_inverse=True)
+        colors = self.get_colors()
+        id_colors = np.array(
+            [ImageColor.getrgb(colors.get(id_, 'white'))[:3]
+             for id_ in ids.tolist()], dtype=np.uint8)
+        pixels = self.get_tile_pixels(
+            id_colors[cells.reshape(raw_map.shape)])
+        self._image = Image.fromarray(pixels, mode='RGB')
+        self._tiles_revision = self._tile_map.get_tiles_revision()
+
+    def render_regions(self, regions):
+        """Renders regions (y0, x0, y1, x1) of map on existing image.
+        Returns False if map ids don't fit in palette anymore"""
+        raw_map = self._tile_map.get_map()
+        if self._image.mode != 'P' or \
+                raw_map.shape[1] * self._tile_size != self._image.size[0] or \
+                raw_map.shape[0] * self._tile_size != self._image.size[1]:
+            return False
+        slot_count = len(self._slots)
+        for y0, x0, y1, x1 in regions:
+            y0, x0 = max(y0, 0), max(x0, 0)
+            y1, x1 = min(y1, raw_map.shape[0]), min(x1, raw_map.shape[1])
+            if y1 <= y0 or x1 <= x0:
+                continue
+            section = self.get_section(y0, x0, y1, x1)
+            if not self.assign_slots(np.unique(section)):
+                return False
+            ids = np.array(list(self._slots.keys()))
+            slots = np.array(list(self._slots.values()), dtype=np.uint8)
+            order = np.argsort(ids)
+            section_slots = slots[order][
+                np.searchsorted(ids[order], section)]
+            self._image.paste(Image.fromarray(
+                self.get_tile_pixels(section_slots), mode='P'),
+                (x0 * self._tile_size, y0 * self._tile_size))
+        if len(self._slots) != slot_count:
+            self.update_palette()
+        return True
+
+    def assign_slots(self, ids):
+        """Gives palette slot to every id without one. Returns False if
+        there are no free slots"""
+        for id_ in ids.tolist():
+            if id_ not in self._slots:
+                slot = len(self._slots) + 2
+                if slot >= self.MAX_SLOTS:
+                    return False
+                self._slots[id_] = slot
+        return True
+
+    def get_tile_pixels(self, section_slots):
+        """Scales slots of cells to tiles with outline on top and left
+        side (right and bottom outline belongs to next tile)"""
+        size = self._tile_size
+        pixels = np.repeat(np.repeat(section_slots, size, axis=0),
+                           size, axis=1)
+        pixels[::size, :] = self.OUTLINE_SLOT
+        pixels[:, ::size] = self.OUTLINE_SLOT
+        return pixels
+
+    def update_palette(self):
+        """Sets palette colors from current tiles"""
+        palette = [(0, 0, 0)] * self.MAX_SLOTS
+        palette[self.MISSING_SLOT] = (255, 255, 255)
+        colors = self.get_colors()
+        for id_, slot in self._slots.items():
+            if id_ in colors:
+                palette[slot] = ImageColor.getrgb(colors[id_])[:3]
+            else:
+                palette[slot] = palette[self.MISSING_SLOT]
+        self._image.putpalette([v for color in palette for v in color])
+        self._tiles_revision = self._tile_map.get_tiles_revision()
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from src.cost_model import CostModel
+from src.generator import (BudgetExceededError, GenerationAbortedError,
+                           TileMapGenerator)
+from src.tile import Tile, TileTreeNode
+from src.tile_map import TileMap
+
+
+def get_tiles(fill=0.5, islands=2, refinement=0):
+    return TileTreeNode(Tile(0, '0', 'blue'), [
+        TileTreeNode(Tile(1, '1', 'green', fill, islands, refinement), [
+            TileTreeNode(Tile(2, '2', 'gray', 0.2, 2))]),
+        TileTreeNode(Tile(3, '3', 'red', 0.1, 3))])
+
+
+def test_estimate_grows_with_size_and_islands():
+    model = CostModel()
+    small = model.estimate(get_tiles(), 100, 100)
+    large = model.estimate(get_tiles(0.01), 1000, 1000)
+    more_islands = model.estimate(get_tiles(0.01, 200), 1000, 1000)
+    assert 0 < small['seconds'] < large['seconds'] < more_islands['seconds']
+    assert 0 < small['bytes'] < large['bytes']
+    assert large['bytes'] > 1000 * 1000 * 8
+    assert small['steps'] > 0
+
+
+def test_refinement_reduces_steps():
+    model = CostModel()
+    fine = model.estimate(get_tiles(), 800, 800)
+    coarse = model.estimate(get_tiles(refinement=3), 800, 800)
+    assert coarse['steps'] < fine['steps'] / 2
+    assert coarse['seconds'] < fine['seconds']
+
+
+def test_calibration_override():
+    model = CostModel({'step_seconds': 1})
+    assert model.estimate(get_tiles(), 10, 10)['seconds'] > 30
+    assert model.get_calibration()['scan_seconds'] == \
+        CostModel.DEFAULT_CALIBRATION['scan_seconds']
+
+
+def test_calibrate():
+    calibration = CostModel().calibrate(size=40)
+    assert all(value >= 0 for value in calibration.values())
+    assert calibration['step_seconds'] > 0
+
+
+def test_budget_rejects_up_front():
+    tile_map = TileMap(20000, 20000, get_tiles(islands=300))
+    with pytest.raises(BudgetExceededError) as error:
+        TileMapGenerator(time_budget=60).generate_map(tile_map)
+    assert error.value.estimate['seconds'] > 60
+    with pytest.raises(BudgetExceededError):
+        TileMapGenerator(memory_budget=2**30).generate_map(tile_map)
+    assert np.all(tile_map.get_map() == 0)
+
+
+def test_generation_within_budget():
+    tile_map = TileMapGenerator(1, time_budget=60, memory_budget=2**30)\
+        .generate_map(TileMap(30, 30, get_tiles()))
+    assert np.count_nonzero(tile_map.get_map() == 1) > 0
+
+
+def test_aborting_generation_mid_run():
+    # underestimating model lets generation start with tiny budget
+    model = CostModel({key: 0 for key in CostModel.DEFAULT_CALIBRATION})
+    tile_map = TileMap(200, 200, get_tiles(fill=0.9, islands=1))
+    with pytest.raises(GenerationAbortedError) as error:
+        TileMapGenerator(1, time_budget=1e-3, cost_model=model)\
+            .generate_map(tile_map)
+    progress = error.value.progress
+    assert progress['total_tiles'] == 3
+    assert 1 not in progress['generated_tiles']
+    assert progress['elapsed_seconds'] > 1e-3
+
+
+def test_sparse_tiles_skip_map_passes():
+    def get_detail_tiles(sparse):
+        return TileTreeNode(Tile(0, '0', 'blue'), [
+            TileTreeNode(Tile(1, '1', 'gray', 0.01, 50, sparse=sparse))])
+    model = CostModel()
+    dense = model.estimate(get_detail_tiles(False), 4000, 4000)
+    sparse = model.estimate(get_detail_tiles(True), 4000, 4000)
+    assert sparse['seconds'] < dense['seconds'] / 4
+    assert sparse['steps'] == dense['steps']
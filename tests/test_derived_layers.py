@@ -0,0 +1,76 @@
+from collections import deque
+
+import numpy as np
+import pytest
+
+from src.derived_layers import DerivedLayers
+from src.generator import BorderGeneration, TileMapGenerator
+from src.tile import Tile, TileTreeNode
+from src.tile_map import TileMap
+
+
+def get_bfs_distance(sources, mode):
+    size_y, size_x = sources.shape
+    distance = np.full(sources.shape, -1)
+    queue = deque()
+    for coord in zip(*np.nonzero(sources)):
+        distance[coord] = 0
+        queue.append(coord)
+    while queue:
+        coord = queue.popleft()
+        for y, x in BorderGeneration.get_adj_coords(coord, mode):
+            if 0 <= y < size_y and 0 <= x < size_x and distance[y, x] < 0:
+                distance[y, x] = distance[coord] + 1
+                queue.append((y, x))
+    return distance
+
+
+@pytest.mark.parametrize('mode', ['sides', 'all'])
+def test_distance_matches_bfs(mode):
+    rng = np.random.default_rng(0)
+    for shape, density in [((17, 23), 0.02), ((1, 9), 0.2), ((12, 1), 0.1),
+                           ((30, 30), 0.002), ((5, 5), 0)]:
+        sources = rng.random(shape) < density
+        assert np.all(DerivedLayers.get_distance(sources, mode) ==
+                      get_bfs_distance(sources, mode))
+
+
+def get_sample_map():
+    tiles = TileTreeNode(Tile(0, '0', 'blue'), [
+        TileTreeNode(Tile(1, '1', 'green', 0.4, 3), [
+            TileTreeNode(Tile(2, '2', 'gray', 0.3, 1))])])
+    return TileMapGenerator(3).generate_map(TileMap(25, 30, tiles))
+
+
+def test_boundary_cells():
+    tile_map = get_sample_map()
+    raw_map = tile_map.get_map()
+    boundary = DerivedLayers.get(tile_map).get_boundary_cells(1, 2)
+    expected = np.zeros_like(boundary)
+    for y, x in np.argwhere(raw_map == 1):
+        expected[y, x] = any(
+            0 <= c[0] < raw_map.shape[0] and 0 <= c[1] < raw_map.shape[1] and
+            raw_map[c] == 2 for c in BorderGeneration.get_adj_coords((y, x)))
+    assert boundary.any()
+    assert np.all(boundary == expected)
+
+
+def test_distance_to_coast():
+    tile_map = get_sample_map()
+    layers = DerivedLayers.get(tile_map)
+    coast = layers.get_coast_cells()
+    assert np.all(tile_map.get_map()[coast] != 0)
+    distance = layers.get_distance_to_coast()
+    assert np.all((distance == 0) == coast)
+
+
+def test_layers_cached_until_map_changes():
+    tile_map = get_sample_map()
+    layers = DerivedLayers.get(tile_map)
+    assert DerivedLayers.get(tile_map) is layers
+    distance = layers.get_distance_to_id(2)
+    assert layers.get_distance_to_id(2) is distance
+    assert not distance.flags.writeable
+    tile_map.get_map()[tile_map.get_map() == 2] = 1
+    tile_map.mark_dirty()
+    assert np.all(layers.get_distance_to_id(2) == -1)
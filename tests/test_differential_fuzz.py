@@ -0,0 +1,95 @@
+from random import Random
+
+import numpy as np
+
+from src.differential_fuzz import DifferentialFuzz
+from src.reference import ReferenceGenerator
+from src.tile import Tile, TileTreeNode
+from src.tile_map import TileMap
+
+
+def get_tiles(islands=3):
+    return TileTreeNode(Tile(0, '0', 'blue'), [
+        TileTreeNode(Tile(1, '1', 'green', 0.4, islands), [
+            TileTreeNode(Tile(2, '2', 'gray', 0.3, 2))])])
+
+
+class SingleIslandGenerator:
+    """Engine generating every tile as one island"""
+
+    def __init__(self, random_seed):
+        self._seed = random_seed
+
+    def generate_map(self, tile_map):
+        def merge(node):
+            tile = node.get_tile()
+            return TileTreeNode(
+                Tile(tile.get_id(), tile.get_name(), tile.get_color(),
+                     tile.get_fill(), 1),
+                [merge(child) for child in node.get_children()])
+        merged = TileMap(1, 1, merge(tile_map.get_tiles()))
+        merged.update_map(tile_map.get_map())
+        ReferenceGenerator(self._seed).generate_map(merged)
+        tile_map.update_map(merged.get_map())
+        return tile_map
+
+
+def test_reference_is_seeded():
+    maps = []
+    for i in range(2):
+        tile_map = TileMap(20, 25, get_tiles())
+        ReferenceGenerator(4).generate_map(tile_map)
+        maps.append(tile_map.get_map())
+    assert np.array_equal(*maps)
+    assert DifferentialFuzz.check_invariants(
+        np.zeros((20, 25), dtype=int), maps[0], get_tiles()) == []
+
+
+def test_invariant_violations():
+    base_map = np.zeros((6, 6), dtype=int)
+    base_map[5, :] = 9
+    raw_map = base_map.copy()
+    raw_map[0, 0] = raw_map[1, 1] = 1
+    raw_map[5, 5] = 1
+    violations = DifferentialFuzz.check_invariants(
+        base_map, raw_map, get_tiles(islands=2))
+    assert "tiles placed on obstacles" in violations
+    assert "islands of tile 1 touch" in violations
+
+    raw_map = base_map.copy()
+    raw_map[:3, :] = 1
+    assert DifferentialFuzz.check_invariants(
+        base_map, raw_map, get_tiles(islands=2)) == \
+        ["tile 1 has 18 cells, more than 14"]
+
+    raw_map = base_map.copy()
+    raw_map[0, ::2] = 1
+    assert DifferentialFuzz.check_invariants(
+        base_map, raw_map, get_tiles(islands=2)) == \
+        ["tile 1 has 3 islands, more than 2"]
+
+
+def test_island_p_value():
+    random_generator = Random(0)
+    same = [np.array([0.1, 0.2, 0.3])] * 4
+    assert DifferentialFuzz.get_island_p_value(
+        same, same, 99, random_generator) == 1.0
+    small = [np.array([0.1, 0.1, 0.1, 0.1])] * 5
+    big = [np.array([0.4])] * 5
+    assert DifferentialFuzz.get_island_p_value(
+        small, big, 999, random_generator) < 0.01
+
+
+def test_generator_matches_reference():
+    reports = DifferentialFuzz(random_seed=2, runs=4).run(4)
+    assert [report['failures'] for report in reports] == [[]] * 4
+    assert all(report['speedup'] > 0 for report in reports)
+
+
+def test_different_engine_is_detected():
+    fuzz = DifferentialFuzz(SingleIslandGenerator, runs=8)
+    tiles = TileTreeNode(Tile(0, '0', 'blue'), [
+        TileTreeNode(Tile(1, '1', 'green', 0.4, 6))])
+    report = fuzz.run_case(tiles, np.zeros((30, 30), dtype=int))
+    assert len(report['failures']) == 1
+    assert report['failures'][0].startswith("tile 1: island sizes differ")
@@ -0,0 +1,49 @@
+import numpy as np
+
+import src.ensemble as ensemble
+from src.ensemble import EnsembleGenerator
+from src.tile import Tile, TileTreeNode
+from src.tile_map import TileMap
+
+
+def get_sample_tiles():
+    return TileTreeNode(Tile(0, '0', 'blue'),
+                        [TileTreeNode(Tile(1, '1', 'green', 0.5, 2),
+                                      [TileTreeNode(Tile(3, '3', 'red'))]),
+                         TileTreeNode(Tile(2, '2', 'gray', 0.2, 1))])
+
+
+def test_scoring_perfect_map():
+    tiles = TileTreeNode(Tile(0, '0', 'blue'),
+                         [TileTreeNode(Tile(1, '1', 'green', 0.5, 2))])
+    raw_map = np.array([[1, 0, 0, 1],
+                        [1, 0, 0, 1]])
+    assert EnsembleGenerator.score_map(raw_map, tiles) == 0
+
+
+def test_scoring_errors():
+    tiles = TileTreeNode(Tile(0, '0', 'blue'),
+                         [TileTreeNode(Tile(1, '1', 'green', 0.5, 2))])
+    raw_map = np.array([[1, 1, 0],
+                        [1, 0, 0]])
+    assert EnsembleGenerator.score_map(raw_map, tiles, 1) == 0.5
+
+
+def test_ensemble_keeps_best_candidate():
+    tile_map = TileMap(20, 20, get_sample_tiles())
+    generator = EnsembleGenerator(candidates=3, workers=2, random_seed=1)
+    generator.generate_map(tile_map)
+    scores = generator.get_scores()
+    assert len(scores) == 3
+    best = EnsembleGenerator.score_map(tile_map.get_map(), get_sample_tiles())
+    assert best == min(scores)
+
+
+def test_ensemble_is_reproducible():
+    maps = []
+    for i in range(2):
+        tile_map = TileMap(15, 15, get_sample_tiles())
+        EnsembleGenerator(2, workers=1, random_seed=5).generate_map(tile_map)
+        maps.append(tile_map.get_map())
+    assert np.all(maps[0] == maps[1])
+    assert ensemble._shared_map is None and ensemble._shared_tiles is None
@@ -1,6 +1,14 @@
+import random
+from math import floor
+
 import numpy as np
 
 from src.generator import BorderGeneration as BG
+from src.generator import CoarseToFineGeneration as CTFG
+from src.generator import GenerationWorkspace, TileMapGenerator
+from src.map_statistics import MapStatistics
+from src.tile import Tile, TileTreeNode
+from src.tile_map import TileMap
 
 
 def test_searching_for_coordinates():
@@ -51,3 +59,205 @@ def test_applying_section():
     map2 = np.array([[3, 5, 0, 0], [1, 1, 0, 0], [0, 0, -1, 0]]).reshape(3, 4)
     map1 = BG.apply_generated_section(map1, map2, 1)
     assert np.all(map1 == 1)
+
+
+def test_workspace_reused_between_tiles(monkeypatch):
+    created = []
+    workspace_init = GenerationWorkspace.__init__
+
+    def counting_init(workspace, shape, *args, **kwargs):
+        created.append(tuple(shape))
+        workspace_init(workspace, shape, *args, **kwargs)
+
+    monkeypatch.setattr(GenerationWorkspace, '__init__', counting_init)
+    tiles = TileTreeNode(Tile(0, '0', 'blue'),
+                         [TileTreeNode(Tile(1, '1', 'green', 0.5, 2),
+                                       [TileTreeNode(Tile(3, '3', 'red'))]),
+                          TileTreeNode(Tile(2, '2', 'gray', 0.3, 1))])
+    tile_map = TileMapGenerator().generate_map(TileMap(20, 30, tiles))
+    assert created == [(20, 30)]
+    assert set(np.unique(tile_map.get_map())) <= {0, 1, 2, 3}
+
+
+def test_seed_without_free_neighbours():
+    raw_map = np.array([[0, 5, 0],
+                        [5, 5, 5],
+                        [0, 5, 0]])
+    generator = BG(raw_map, 0)
+    raw_map = generator.generate_tile(raw_map, 0, 1, 1, 2)
+    assert np.count_nonzero(raw_map == 1) == 2
+
+
+def test_generation_keeps_other_ids():
+    raw_map = np.array([[0, 0, 5], [0, 0, 5], [0, 0, 5]])
+    generator = BG(raw_map, 0)
+    raw_map = generator.generate_tile(raw_map, 0, 1, 0.5)
+    assert np.all(raw_map[:, 2] == 5)
+    assert np.count_nonzero(raw_map == 1) == 3
+
+
+def test_coarse_to_fine_generation():
+    tiles = TileTreeNode(Tile(0, '0', 'blue'),
+                         [TileTreeNode(Tile(1, '1', 'green', 0.4, 3, 2))])
+    raw_map = np.zeros((80, 90), dtype=int)
+    TileMapGenerator(3).generate_section(raw_map, tiles)
+    fill = np.count_nonzero(raw_map == 1) / raw_map.size
+    assert abs(fill - 0.4) <= 0.04
+    assert MapStatistics.count_islands(raw_map, [1]) == 3
+    assert MapStatistics.count_islands(raw_map, [1], mode='all') == 3
+
+
+def test_coarse_to_fine_low_fill():
+    for random_seed in range(3):
+        tiles = TileTreeNode(Tile(0, '0', 'blue'),
+                             [TileTreeNode(Tile(1, '1', 'green', 0.01, 5, 3))])
+        raw_map = np.zeros((100, 100), dtype=int)
+        TileMapGenerator(random_seed).generate_section(raw_map, tiles)
+        assert np.count_nonzero(raw_map == 1) <= 100
+        assert MapStatistics.count_islands(raw_map, [1]) == 5
+
+
+def test_coarse_to_fine_on_fragmented_parent():
+    raw_map = np.zeros((34, 63), dtype=int)
+    # stripes of other tile leave no full coarse block with free neighbour
+    raw_map[::3, :] = 5
+    raw_map[:, ::5] = 5
+    tiles = TileTreeNode(Tile(0, '0', 'blue'),
+                         [TileTreeNode(Tile(1, '1', 'green', 0.67, 4, 1))])
+    TileMapGenerator(6).generate_section(raw_map, tiles)
+    assert np.all(raw_map[::3, :] == 5)
+    assert MapStatistics.count_islands(raw_map, [1], mode='all') <= 4
+
+
+def test_coarse_islands_stripped_whole_do_not_touch():
+    # islands of single block are stripped whole and reseeded after other
+    # islands have regrown
+    tiles = TileTreeNode(Tile(0, '0', 'blue'),
+                         [TileTreeNode(Tile(1, '1', 'green', 0.45, 6, 1))])
+    for random_seed in range(40):
+        raw_map = np.zeros((13, 15), dtype=int)
+        TileMapGenerator(random_seed).generate_section(raw_map, tiles)
+        assert MapStatistics.count_islands(raw_map, [1]) == \
+            MapStatistics.count_islands(raw_map, [1], mode='all')
+
+
+def test_coarse_workspace_is_shared(monkeypatch):
+    created = []
+    workspace_init = GenerationWorkspace.__init__
+
+    def counting_init(workspace, shape, *args, **kwargs):
+        created.append(tuple(shape))
+        workspace_init(workspace, shape, *args, **kwargs)
+
+    monkeypatch.setattr(GenerationWorkspace, '__init__', counting_init)
+    tiles = TileTreeNode(Tile(0, '0', 'blue'),
+                         [TileTreeNode(Tile(1, '1', 'green', 0.5, 2, 1),
+                                       [TileTreeNode(Tile(3, '3', 'red',
+                                                          0.3, 1, 1))]),
+                          TileTreeNode(Tile(2, '2', 'gray', 0.3, 1, 1))])
+    TileMapGenerator().generate_map(TileMap(20, 30, tiles))
+    assert created == [(20, 30), (10, 15)]
+
+
+def test_coarse_map():
+    raw_map = np.array([[0, 0, 0, 0, 0],
+                        [0, 0, 0, 1, 0],
+                        [0, 0, 0, 0, 0]])
+    generator = CTFG(raw_map, 0, 1)
+    assert np.all(generator.get_coarse_map() == [[0, -1, -1], [-1, -1, -1]])
+
+
+def test_seed_does_not_change_random_module():
+    tiles = TileTreeNode(Tile(0, '0', 'blue'),
+                         [TileTreeNode(Tile(1, '1', 'green', 0.5, 2))])
+    state = random.getstate()
+    maps = [TileMapGenerator(4).generate_map(TileMap(10, 10, tiles)).get_map()
+            for i in range(2)]
+    assert random.getstate() == state
+    assert np.all(maps[0] == maps[1])
+
+
+def get_delta_tiles():
+    return TileTreeNode(Tile(0, '0', 'blue'), [
+        TileTreeNode(Tile(1, '1', 'green', 0.5, 3), [
+            TileTreeNode(Tile(3, '3', 'black', 0.3, 2))]),
+        TileTreeNode(Tile(2, '2', 'red', 0.3, 2, refinement=2))])
+
+
+def test_deltas_reproduce_generated_map():
+    tile_map = TileMap(40, 50, get_delta_tiles())
+    replayed = tile_map.get_map().copy()
+    batches = []
+
+    def apply(cells, ids):
+        assert len(cells) <= 64
+        batches.append(len(cells))
+        replayed.reshape(-1)[cells] = ids
+
+    TileMapGenerator(5).generate_map(tile_map, apply, delta_batch=64)
+    assert len(batches) > 1
+    assert np.all(replayed == tile_map.get_map())
+    assert np.all(tile_map.get_map() ==
+                  TileMapGenerator(5).generate_map(
+                      TileMap(40, 50, get_delta_tiles())).get_map())
+
+
+def test_iterating_deltas():
+    tile_map = TileMap(30, 30, get_delta_tiles())
+    replayed = tile_map.get_map().copy()
+    for cells, ids in TileMapGenerator(2).iter_deltas(tile_map, 50, 2):
+        replayed.reshape(-1)[cells] = ids
+    assert np.all(replayed == tile_map.get_map())
+
+
+def test_stopping_delta_iteration():
+    deltas = TileMapGenerator(2).iter_deltas(
+        TileMap(30, 30, get_delta_tiles()), 10, 1)
+    next(deltas)
+    deltas.close()
+
+
+def get_sparse_tiles():
+    return TileTreeNode(Tile(0, '0', 'blue'), [
+        TileTreeNode(Tile(4, '4', 'yellow', 0.05, 4, sparse=True), [
+            TileTreeNode(Tile(5, '5', 'white', 0.5, 1))]),
+        TileTreeNode(Tile(1, '1', 'green', 0.5, 2), [
+            TileTreeNode(Tile(3, '3', 'black', 0.02, 3, sparse=True))])])
+
+
+def test_sparse_tiles_kept_in_layer():
+    tile_map = TileMapGenerator(4).generate_map(
+        TileMap(60, 70, get_sparse_tiles()))
+    raw_map = tile_map.get_map()
+    assert set(np.unique(raw_map)) == {0, 1}
+    layers = tile_map.get_sparse_layers()
+    assert len(layers) == 2
+    merged = tile_map.get_merged_map()
+    # sparse tiles are generated only on their parent tiles
+    for layer, parent_ids in zip(layers, [{1}, {0}]):
+        assert len(layer) > 0
+        assert set(raw_map.reshape(-1)[layer.get_cells()]) == parent_ids
+    assert MapStatistics.count_islands(merged, [3], mode='all') == 3
+    assert MapStatistics.count_islands(merged, [4], mode='all') <= 4
+    assert np.count_nonzero(merged == 5) > 0
+    assert np.count_nonzero(merged == 3) <= floor(
+        np.count_nonzero(merged == 1) * 0.021) + 3
+
+
+def test_merging_sparse_layers():
+    tile_map = TileMapGenerator(4).generate_map(
+        TileMap(40, 40, get_sparse_tiles()))
+    merged = tile_map.get_merged_map()
+    revision = tile_map.get_map_revision()
+    tile_map.merge_sparse_layers()
+    assert tile_map.get_sparse_layers() == []
+    assert np.all(tile_map.get_map() == merged)
+    assert tile_map.get_dirty_regions(revision)
+
+
+def test_sparse_generation_is_seeded():
+    first = TileMapGenerator(7).generate_map(
+        TileMap(30, 30, get_sparse_tiles())).get_merged_map()
+    second = TileMapGenerator(7).generate_map(
+        TileMap(30, 30, get_sparse_tiles())).get_merged_map()
+    assert np.all(first == second)
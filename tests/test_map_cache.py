@@ -0,0 +1,54 @@
+import os
+
+import numpy as np
+
+from src.map_cache import TileMapCache
+from src.tile import Tile, TileTreeNode
+from src.tile_map import TileMap
+
+
+def get_sample_map(size=(20, 20), fill=0.4):
+    tiles = TileTreeNode(Tile(0, '0', 'blue'),
+                         [TileTreeNode(Tile(1, '1', 'green', fill, 2))])
+    return TileMap(size[0], size[1], tiles)
+
+
+def test_cache_hit(tmp_path):
+    cache = TileMapCache(str(tmp_path))
+    generated = cache.generate_map(get_sample_map(), 3).get_map()
+    cached = cache.generate_map(get_sample_map(), 3).get_map()
+    assert np.all(generated == cached)
+    assert isinstance(cached, np.memmap)
+    assert not cached.flags.writeable
+    assert cache.get_stats()['hits'] == 1
+    assert cache.get_stats()['misses'] == 1
+
+
+def test_cache_keys(tmp_path):
+    key = TileMapCache.get_key(get_sample_map(), 1)
+    assert key == TileMapCache.get_key(get_sample_map(), 1)
+    assert key != TileMapCache.get_key(get_sample_map(), 2)
+    assert key != TileMapCache.get_key(get_sample_map((20, 21)), 1)
+    assert key != TileMapCache.get_key(get_sample_map(fill=0.3), 1)
+
+
+def test_maps_without_seed_are_not_cached(tmp_path):
+    cache = TileMapCache(str(tmp_path))
+    cache.generate_map(get_sample_map(), None)
+    assert cache.get_stats()['bypassed'] == 1
+    assert cache.get_size() == 0
+
+
+def test_least_recently_used_eviction(tmp_path):
+    map_bytes = get_sample_map().get_map().nbytes + 128
+    cache = TileMapCache(str(tmp_path), max_bytes=2 * map_bytes)
+    cache.generate_map(get_sample_map(), 1)
+    cache.generate_map(get_sample_map(), 2)
+    first = cache.get_path(TileMapCache.get_key(get_sample_map(), 1))
+    os.utime(first, (1, 1))
+    cache.generate_map(get_sample_map(), 3)
+    assert cache.get_stats()['evictions'] == 1
+    assert not os.path.exists(first)
+    assert cache.get_size() <= 2 * map_bytes
+    assert not [name for name in os.listdir(tmp_path)
+                if name.endswith('.tmp')]
@@ -0,0 +1,51 @@
+import numpy as np
+
+from src.map_index import TileMapIndex
+from src.tile import Tile, TileTreeNode
+from src.tile_map import TileMap
+
+
+def get_sample_index(block_size=2):
+    tiles = TileTreeNode(Tile(0, '0', 'blue'),
+                         [TileTreeNode(Tile(1, '1', 'green')),
+                          TileTreeNode(Tile(2, '2', 'red'))])
+    tile_map = TileMap(5, 6, tiles)
+    tile_map.update_map(np.array([[1, 1, 0, 0, 0, 2],
+                                  [1, 0, 0, 1, 0, 0],
+                                  [0, 0, 0, 1, 1, 0],
+                                  [2, 0, 0, 0, 0, 0],
+                                  [2, 2, 0, 0, 0, 1]]))
+    return TileMapIndex(tile_map, block_size)
+
+
+def test_window_queries():
+    index = get_sample_index()
+    assert index.get_ids() == [0, 1, 2]
+    cells = index.get_cells_in_window(1, 0, 0, 2, 4)
+    assert cells.tolist() == [[0, 0], [0, 1], [1, 0], [1, 3]]
+    assert index.count_cells_in_window(1, 1, 3, 10, 10) == 4
+    assert index.get_cells_in_window(2, 1, 1, 3, 3).shape == (0, 2)
+    assert len(index.get_cells(0)) == 19
+
+
+def test_nearest_cell():
+    index = get_sample_index()
+    assert index.get_nearest_cell(2, 0, 4) == (0, 5)
+    assert index.get_nearest_cell(2, 4, 4) == (4, 1)
+    assert index.get_nearest_cell(1, 3, 4) == (2, 4)
+    assert index.get_nearest_cell(7, 0, 0) is None
+
+
+def test_islands():
+    index = get_sample_index()
+    boxes = index.get_island_bounding_boxes(1)
+    assert boxes.tolist() == [[0, 0, 2, 2], [1, 3, 3, 5], [4, 5, 5, 6]]
+    assert index.get_island_cells(1, 1).tolist() == [[1, 3], [2, 3], [2, 4]]
+    assert len(index.get_island_bounding_boxes(0)) == 1
+
+
+def test_block_summary():
+    index = get_sample_index()
+    assert index.get_ids_in_block(0, 0) == [0, 1]
+    assert index.get_ids_in_block(2, 2) == [0, 1]
+    assert index.get_ids_in_window(3, 0, 5, 2) == [0, 2]
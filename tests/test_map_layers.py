@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from src.generator import TileMapGenerator
+from src.map_layers import LayerGenerator
+from src.tile import Tile, TileTreeNode
+from src.tile_map import TileMap
+from src.tile_map_io import TileMapIO
+from src.visualisation import TileMapRenderCache
+
+
+def get_base_map():
+    tiles = TileTreeNode(Tile(0, 'water', 'blue'), [
+        TileTreeNode(Tile(1, 'land', 'green', 0.5, 3))])
+    tile_map = TileMap(40, 40, tiles)
+    TileMapGenerator(0).generate_map(tile_map)
+    return tile_map
+
+
+def add_layers(tile_map):
+    tile_map.add_layer('forest', TileTreeNode(Tile(1, 'land', 'green'), [
+        TileTreeNode(Tile(2, 'forest', 'darkgreen', 0.3, 4))]))
+    tile_map.add_layer('reef', TileTreeNode(Tile(0, 'water', 'blue'), [
+        TileTreeNode(Tile(3, 'reef', 'orange', 0.05, 5, sparse=True))]))
+    return tile_map
+
+
+def get_layer_cells(tile_map):
+    return {name: (tile_map.get_layer(name).get_cells().get_cells().tolist(),
+                   tile_map.get_layer(name).get_cells().get_ids().tolist())
+            for name in tile_map.get_layer_names()}
+
+
+def test_adding_layer_with_used_ids():
+    tile_map = add_layers(get_base_map())
+    with pytest.raises(ValueError):
+        tile_map.add_layer('forest', TileTreeNode(Tile(1, 'land', 'green')))
+    with pytest.raises(ValueError):
+        tile_map.add_layer('hills', TileTreeNode(Tile(1, 'land', 'green'), [
+            TileTreeNode(Tile(2, 'hills', 'grey', 0.3, 1))]))
+    assert tile_map.get_layer_names() == ['forest', 'reef']
+
+
+def test_layers_grow_on_root_id_without_changing_map():
+    tile_map = add_layers(get_base_map())
+    base = tile_map.get_map().copy()
+    LayerGenerator(1, random_seed=3).generate_layers(tile_map)
+    assert np.array_equal(tile_map.get_map(), base)
+    flat_base = base.reshape(-1)
+    forest = tile_map.get_layer('forest').get_cells()
+    reef = tile_map.get_layer('reef').get_cells()
+    assert len(forest) and len(reef)
+    assert set(forest.get_ids().tolist()) == {2}
+    assert set(reef.get_ids().tolist()) == {3}
+    assert np.all(flat_base[forest.get_cells()] == 1)
+    assert np.all(flat_base[reef.get_cells()] == 0)
+
+    composited = tile_map.get_composited_map()
+    assert np.all(composited.reshape(-1)[forest.get_cells()] == 2)
+    assert np.array_equal(tile_map.get_composited_map(['reef']) == 2,
+                          np.zeros_like(base, dtype=bool))
+
+
+def test_layers_are_the_same_in_threads_and_processes():
+    serial = add_layers(get_base_map())
+    LayerGenerator(1, random_seed=5).generate_layers(serial)
+    threads = add_layers(get_base_map())
+    LayerGenerator(2, random_seed=5, use_threads=True).generate_layers(
+        threads)
+    processes = add_layers(get_base_map())
+    LayerGenerator(2, random_seed=5).generate_layers(processes)
+    assert get_layer_cells(serial) == get_layer_cells(threads)
+    assert get_layer_cells(serial) == get_layer_cells(processes)
+
+
+def test_selecting_and_rendering_layers(tmp_path):
+    tile_map = add_layers(get_base_map())
+    LayerGenerator(1, random_seed=1).generate_layers(tile_map)
+    selected = tile_map.select_layers(['reef'])
+    assert selected.get_map() is tile_map.get_map()
+    assert selected.get_layer_names() == ['reef']
+    assert tile_map.get_layer_names() == ['forest', 'reef']
+
+    TileMapIO.save_map_to_file(tile_map, str(tmp_path / 'map'), ['forest'])
+    loaded = TileMapIO.load_map_from_file(str(tmp_path / 'map.pickle'))
+    assert loaded.get_layer_names() == ['forest']
+
+    cache = TileMapRenderCache(tile_map, 3, ['forest'])
+    pixels = np.array(cache.get_map_image().convert('RGB'))
+    (y, x), = tile_map.get_layer('forest').get_cells().get_coordinates()[:1]
+    assert pixels[y * 3 + 1, x * 3 + 1].tolist() == [0, 100, 0]
+    (y, x), = tile_map.get_layer('reef').get_cells().get_coordinates()[:1]
+    assert pixels[y * 3 + 1, x * 3 + 1].tolist() == [0, 0, 255]
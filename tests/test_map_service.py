@@ -0,0 +1,127 @@
+import asyncio
+import json
+
+import numpy as np
+
+from src.map_service import GenerationRequest, MapGenerationService
+from src.polygon_export import PolygonExport
+from src.tile import Tile, TileTreeNode
+from src.tile_map_io import TileMapIO
+
+
+def get_request_body(seed=1, format_='binary', size=(20, 30)):
+    tiles = TileTreeNode(Tile(0, '0', 'blue'),
+                         [TileTreeNode(Tile(1, '1', 'green', 0.4, 2))])
+    return json.dumps({'tiles': tiles.to_dict(), 'size': list(size),
+                       'seed': seed, 'format': format_}).encode()
+
+
+async def send_request(port, method, path, body=b''):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    response = await asyncio.wait_for(reader.read(), 60)
+    writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), body
+
+
+def run_with_service(test, **kwargs):
+    async def run():
+        service = MapGenerationService(port=0, workers=1, **kwargs)
+        port = await service.start()
+        try:
+            return await test(service, port)
+        finally:
+            await service.stop()
+    return asyncio.run(run())
+
+
+def test_generating_binary_map():
+    async def test(service, port):
+        return await send_request(port, 'POST', '/generate',
+                                  get_request_body())
+    status, body = run_with_service(test)
+    assert status == 200
+    raw_map = TileMapIO.load_map_from_binary(body)
+    assert raw_map.shape == (20, 30)
+    assert set(np.unique(raw_map)) == {0, 1}
+
+
+def test_generating_polygons():
+    async def test(service, port):
+        return [await send_request(port, 'POST', '/generate',
+                                   get_request_body(format_=format_))
+                for format_ in ('binary', 'geojson', 'polygons')]
+    binary, geojson, polygons = run_with_service(test)
+    assert geojson[0] == 200 and polygons[0] == 200
+    features = json.loads(geojson[1])['features']
+    assert [feature['properties']['id'] for feature in features] == [0, 1]
+    shape, islands = TileMapIO.load_polygons_from_binary(polygons[1])
+    assert np.array_equal(PolygonExport.rasterize(islands, shape),
+                          TileMapIO.load_map_from_binary(binary[1]))
+
+
+def test_coalescing_identical_requests():
+    async def test(service, port):
+        responses = await asyncio.gather(*[
+            send_request(port, 'POST', '/generate', get_request_body())
+            for i in range(3)])
+        return responses, service.get_metrics()
+    responses, metrics = run_with_service(test)
+    assert [status for status, body in responses] == [200, 200, 200]
+    assert responses[0][1] == responses[1][1] == responses[2][1]
+    assert metrics['generated'] == 1
+    assert metrics['coalesced'] == 2
+    assert metrics['pending'] == 0
+
+
+def test_back_pressure():
+    async def test(service, port):
+        return await asyncio.gather(*[
+            send_request(port, 'POST', '/generate', get_request_body(seed))
+            for seed in range(2)])
+    responses = run_with_service(test, max_pending=1)
+    assert sorted(status for status, body in responses) == [200, 503]
+
+
+def test_metrics_and_errors():
+    async def test(service, port):
+        bad = await send_request(port, 'POST', '/generate', b'{"size": 3}')
+        bad_format = await send_request(
+            port, 'POST', '/generate',
+            json.dumps({**json.loads(get_request_body()),
+                        'format': []}).encode())
+        assert bad_format[0] == 400
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b"POST /generate HTTP/1.1\r\nContent-Length: x\r\n\r\n")
+        response = await asyncio.wait_for(reader.read(), 60)
+        writer.close()
+        assert response.split()[1] == b'400'
+        missing = await send_request(port, 'GET', '/other')
+        png = await send_request(port, 'POST', '/generate',
+                                 get_request_body(format_='png'))
+        metrics = await send_request(port, 'GET', '/metrics')
+        return bad, missing, png, metrics
+    bad, missing, png, metrics = run_with_service(test)
+    assert bad[0] == 400
+    assert missing[0] == 404
+    assert png[0] == 200 and png[1].startswith(b'\x89PNG')
+    metrics = json.loads(metrics[1])
+    assert metrics['requests'] == 3
+    assert 'latency_p95' in metrics
+
+
+def test_request_validation():
+    request = GenerationRequest(get_request_body(seed=None))
+    assert request.seed is None
+    assert request.get_key() == \
+        GenerationRequest(get_request_body(seed=None)).get_key()
+    for body in [b'[]', get_request_body(size=(0, 3)),
+                 get_request_body(format_='gif')]:
+        try:
+            GenerationRequest(body)
+            assert False
+        except ValueError:
+            pass
@@ -0,0 +1,35 @@
+import numpy as np
+
+from src.map_statistics import MapStatistics
+
+
+def test_labeling_regions():
+    raw_map = np.array([[1, 1, 0, 1],
+                        [0, 1, 0, 1],
+                        [1, 0, 0, 0]])
+    labels, count = MapStatistics.label_regions(raw_map)
+    assert count == 5
+    assert labels[0, 0] == labels[1, 1]
+    assert labels[0, 2] == labels[2, 1]
+    assert labels[2, 0] != labels[1, 1]
+
+
+def test_labeling_masked_regions():
+    raw_map = np.array([[1, 1, 0, 1],
+                        [0, 1, 0, 1],
+                        [1, 0, 0, 0]])
+    labels, count = MapStatistics.label_regions(raw_map, raw_map == 1)
+    assert count == 3
+    assert np.all(labels[raw_map == 0] == 0)
+    labels, count = MapStatistics.label_regions(
+        raw_map, raw_map == 1, mode='all')
+    assert count == 2
+
+
+def test_counting_islands():
+    raw_map = np.array([[1, 2, 0, 1],
+                        [0, 0, 0, 1],
+                        [3, 0, 3, 0]])
+    assert MapStatistics.count_islands(raw_map, [1, 2]) == 2
+    assert MapStatistics.count_islands(raw_map, [3]) == 2
+    assert MapStatistics.count_islands(raw_map, [5]) == 0
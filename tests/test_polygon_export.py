@@ -0,0 +1,104 @@
+import json
+
+import numpy as np
+
+from src.generator import TileMapGenerator
+from src.map_statistics import MapStatistics
+from src.polygon_export import PolygonExport
+from src.tile import Tile, TileTreeNode
+from src.tile_map import TileMap
+from src.tile_map_io import TileMapIO
+
+
+def get_map(raw_map):
+    tiles = TileTreeNode(Tile(0, 'water', 'blue'), [
+        TileTreeNode(Tile(1, 'land', 'green')),
+        TileTreeNode(Tile(2, 'forest', 'darkgreen'))])
+    tile_map = TileMap(1, 1, tiles)
+    tile_map.update_map(np.array(raw_map))
+    return tile_map
+
+
+def test_island_with_hole():
+    raw_map = np.zeros((5, 6), dtype=int)
+    raw_map[1:4, 1:5] = 1
+    raw_map[2, 2] = 2
+    polygons = PolygonExport.trace_polygons(raw_map)
+    land = [rings for id_, rings in polygons if id_ == 1]
+    assert len(land) == 1 and len(land[0]) == 2
+    exterior, hole = land[0]
+    # collinear vertices are dropped
+    assert len(exterior) == 4 and len(hole) == 4
+    assert sorted(map(tuple, exterior.tolist())) == \
+        [(1, 1), (1, 4), (5, 1), (5, 4)]
+    assert sorted(map(tuple, hole.tolist())) == \
+        [(2, 2), (2, 3), (3, 2), (3, 3)]
+    assert np.array_equal(PolygonExport.rasterize(polygons, (5, 6)),
+                          raw_map)
+
+
+def test_cells_touching_by_corner_are_separate_islands():
+    raw_map = np.array([[1, 0, 1],
+                        [0, 1, 0],
+                        [1, 0, 1]])
+    polygons = PolygonExport.trace_polygons(raw_map)
+    assert sum(1 for id_, rings in polygons if id_ == 1) == 5
+    water = [rings for id_, rings in polygons if id_ == 0]
+    assert len(water) == 4
+    assert np.array_equal(PolygonExport.rasterize(polygons, (3, 3)),
+                          raw_map)
+
+
+def test_random_maps_round_trip():
+    random_generator = np.random.default_rng(0)
+    for i in range(100):
+        raw_map = random_generator.integers(0, 3, (8, 11))
+        polygons = PolygonExport.trace_polygons(raw_map)
+        assert len(polygons) == MapStatistics.label_regions(raw_map)[1]
+        assert np.array_equal(PolygonExport.rasterize(polygons, (8, 11)),
+                              raw_map)
+        for id_, rings in polygons:
+            island = PolygonExport.rasterize([(id_, rings)], (8, 11)) == id_
+            assert MapStatistics.label_regions(island, island)[1] == 1
+
+
+def test_binary_round_trip():
+    tiles = TileTreeNode(Tile(0, 'water', 'blue'), [
+        TileTreeNode(Tile(1, 'land', 'green', 0.5, 4), [
+            TileTreeNode(Tile(2, 'lake', 'cyan', 0.2, 3))])])
+    tile_map = TileMap(60, 70, tiles)
+    TileMapGenerator(2).generate_map(tile_map)
+    data = TileMapIO.get_map_polygons(tile_map)
+    shape, polygons = TileMapIO.load_polygons_from_binary(data)
+    assert shape == (60, 70)
+    assert np.array_equal(PolygonExport.rasterize(polygons, shape),
+                          tile_map.get_map())
+    for (id_a, rings_a), (id_b, rings_b) in zip(
+            PolygonExport(tile_map).get_polygons(), polygons):
+        assert id_a == id_b
+        assert all(np.array_equal(a, b) for a, b in zip(rings_a, rings_b))
+    assert len(data) < len(TileMapIO.get_map_binary(tile_map.get_map()))
+
+
+def test_geojson():
+    raw_map = np.zeros((4, 4), dtype=int)
+    raw_map[1:3, 1:3] = 2
+    geojson = json.loads(TileMapIO.get_map_geojson(get_map(raw_map)))
+    assert [feature['properties'] for feature in geojson['features']] == [
+        {'id': 0, 'name': 'water', 'color': 'blue'},
+        {'id': 2, 'name': 'forest', 'color': 'darkgreen'}]
+    water, forest = (feature['geometry'] for feature in geojson['features'])
+    assert forest == {'type': 'MultiPolygon', 'coordinates': [
+        [[[1, 1], [3, 1], [3, 3], [1, 3], [1, 1]]]]}
+    # water surrounds forest
+    assert len(water['coordinates']) == 1
+    assert len(water['coordinates'][0]) == 2
+
+
+def test_polygons_follow_map_revision():
+    tile_map = get_map(np.zeros((3, 3), dtype=int))
+    export = PolygonExport(tile_map)
+    assert len(export.get_polygons()) == 1
+    tile_map.get_map()[1, 1] = 1
+    tile_map.mark_dirty((1, 1, 2, 2))
+    assert len(export.get_polygons()) == 2
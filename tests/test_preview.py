@@ -0,0 +1,49 @@
+import numpy as np
+
+from src.preview import MapPreview
+from src.tile import Tile, TileTreeNode
+
+
+def get_tiles():
+    return TileTreeNode(Tile(0, '0', 'blue'), [
+        TileTreeNode(Tile(1, '1', 'green', 0.5, 400), [
+            TileTreeNode(Tile(2, '2', 'gray', 0.3, 2))]),
+        TileTreeNode(Tile(3, '3', 'red', 0.1, 1000))])
+
+
+def test_preview_size_and_islands():
+    preview = MapPreview(time_budget=10)
+    tiles, size_y, size_x = preview.get_preview(get_tiles(), 1000, 2000)
+    assert (size_y, size_x) == (100, 200)
+    first, second = tiles.get_children()
+    assert first.get_tile().get_islands() == 4
+    assert first.get_children()[0].get_tile().get_islands() == 1
+    assert second.get_tile().get_islands() == 10
+    assert first.get_tile().get_refinement() > 0
+
+
+def test_small_maps_are_not_scaled():
+    tiles, size_y, size_x = MapPreview(time_budget=10).get_preview(
+        get_tiles(), 50, 60)
+    assert (size_y, size_x) == (50, 60)
+    assert tiles.get_children()[1].get_tile().get_islands() == 1000
+
+
+def test_refinement_fits_island_size():
+    assert MapPreview.get_refinement(10) == 0
+    assert MapPreview.get_refinement(64) == 1
+    assert MapPreview.get_refinement(10 ** 6) == MapPreview.MAX_REFINEMENT
+
+
+def test_preview_generation():
+    preview = MapPreview(time_budget=5)
+    tile_map, complete = preview.generate(get_tiles(), 5000, 5000)
+    assert complete
+    assert max(tile_map.get_map().shape) <= 200
+    assert set(np.unique(tile_map.get_map())) == {0, 1, 2, 3}
+
+
+def test_preview_shrinks_to_time_budget():
+    preview = MapPreview(time_budget=1e-3)
+    tile_map, complete = preview.generate(get_tiles(), 5000, 5000)
+    assert max(tile_map.get_map().shape) < 200
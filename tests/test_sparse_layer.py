@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from src.sparse_layer import SparseLayer
+
+
+def test_layer_keeps_last_id_of_repeated_cell():
+    layer = SparseLayer((3, 4), [5, 1, 5, 11], [1, 2, 3, 4])
+    assert layer.get_cells().tolist() == [1, 5, 11]
+    assert layer.get_ids().tolist() == [2, 3, 4]
+    assert layer.get_id_cells(4).tolist() == [11]
+    assert layer.get_bounding_box() == (0, 1, 3, 4)
+
+
+def test_merging_layer():
+    layer = SparseLayer((3, 4), [1, 6, 7], [2, 3, 3])
+    raw_map = layer.merge_into(np.zeros((3, 4), dtype=int))
+    assert raw_map.tolist() == [[0, 2, 0, 0], [0, 0, 3, 3], [0, 0, 0, 0]]
+    with pytest.raises(ValueError):
+        layer.merge_into(np.zeros((4, 3), dtype=int))
+    with pytest.raises(ValueError):
+        SparseLayer((3, 4), [12], [1])
+
+
+def test_rle_rows():
+    # run of 3 is cut by end of row
+    layer = SparseLayer((3, 4), [2, 3, 4, 5, 6, 9], [1, 1, 1, 2, 2, 1])
+    rows, columns, lengths, ids = layer.get_rle_rows()
+    assert rows.tolist() == [0, 1, 1, 2]
+    assert columns.tolist() == [2, 0, 1, 1]
+    assert lengths.tolist() == [2, 1, 2, 1]
+    assert ids.tolist() == [1, 1, 2, 1]
+    restored = SparseLayer.from_rle_rows((3, 4), rows, columns, lengths, ids)
+    assert restored.get_cells().tolist() == layer.get_cells().tolist()
+    assert restored.get_ids().tolist() == layer.get_ids().tolist()
+    assert len(SparseLayer((2, 2)).get_rle_rows()[0]) == 0
+
+
+def test_combining_layers():
+    combined = SparseLayer.combine([SparseLayer((2, 2), [0, 1], [1, 1]),
+                                    SparseLayer((2, 2), [1, 3], [2, 2])])
+    assert combined.get_cells().tolist() == [0, 1, 3]
+    assert combined.get_ids().tolist() == [1, 2, 2]
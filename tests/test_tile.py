@@ -23,6 +23,8 @@ def test_malformed_tile_info():
         Tile(-1, '', 'red', 0.2, 1)
     with pytest.raises(ValueError):
         Tile(0, '', 'red', 1.2, 1)
+    with pytest.raises(ValueError):
+        Tile(0, '', 'red', 0.2, 1, -1)
 
 
 def test_tiles_info():
@@ -51,3 +53,18 @@ def test_names_list():
                                              ])
                                ])
     assert sample_ttn.get_names_list() == ['0', '1', '2', '3']
+
+
+def test_tree_dictionary():
+    sample_ttn = TileTreeNode(Tile(0, '0', 'red'),
+                              [TileTreeNode(Tile(1, '1', 'green', 0.3, 2, 1,
+                                                 sparse=True))])
+    data = sample_ttn.to_dict()
+    assert data["children"][0]["islands"] == 2
+    assert data["children"][0]["sparse"]
+    assert not TileTreeNode.from_dict({"id": 0, "name": "0", "color": "red"})\
+        .get_tile().is_sparse()
+    loaded = TileTreeNode.from_dict(data)
+    assert loaded.to_dict() == data
+    with pytest.raises(ValueError):
+        TileTreeNode.from_dict({"id": 0})
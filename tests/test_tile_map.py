@@ -17,3 +17,22 @@ def test_wrong_data():
         TileMap(-2, 4, TileTreeNode(Tile(0, "", "")))
     with pytest.raises(TypeError):
         TileMap(2, 4, 5)
+
+
+def test_dirty_regions():
+    tm = TileMap(3, 5, TileTreeNode(Tile(0, "", "")))
+    revision = tm.get_map_revision()
+    tm.mark_dirty((0, 0, 1, 1))
+    tm.mark_dirty((1, 1, 2, 3))
+    assert tm.get_dirty_regions(revision) == [(0, 0, 1, 1), (1, 1, 2, 3)]
+    assert tm.get_dirty_regions(revision + 1) == [(1, 1, 2, 3)]
+    tm.update_map(tm.get_map())
+    assert tm.get_dirty_regions(revision) is None
+    assert tm.get_dirty_regions(tm.get_map_revision()) == []
+
+
+def test_tiles_revision():
+    tm = TileMap(3, 5, TileTreeNode(Tile(0, "", "")))
+    revision = tm.get_tiles_revision()
+    tm.update_tiles(TileTreeNode(Tile(0, "", "")))
+    assert tm.get_tiles_revision() == revision + 1
@@ -0,0 +1,77 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+from src.tile import Tile, TileTreeNode
+from src.tile_map import TileMap
+from src.tile_map_shm import TileMapAttacher, TileMapPublisher
+
+
+def get_sample_map():
+    tiles = TileTreeNode(Tile(0, '0', 'blue'),
+                         [TileTreeNode(Tile(1, '1', 'green'))])
+    tile_map = TileMap(4, 6, tiles)
+    tile_map.get_map()[1:3, 2:5] = 1
+    return tile_map
+
+
+def sum_shared_map(name):
+    attacher = TileMapAttacher(name)
+    tile_map = attacher.get_tile_map()
+    total = int(tile_map.get_map().sum())
+    names = tile_map.get_tiles().get_names_list()
+    del tile_map
+    attacher.close()
+    return total, names
+
+
+def test_attaching_to_published_map():
+    publisher = TileMapPublisher(get_sample_map())
+    attacher = TileMapAttacher(publisher.get_name())
+    tile_map = attacher.get_tile_map()
+    assert np.all(tile_map.get_map() == get_sample_map().get_map())
+    assert tile_map.get_tiles().get_names_list() == ['0', '1']
+    with pytest.raises(ValueError):
+        tile_map.get_map()[0, 0] = 1
+    del tile_map
+    attacher.close()
+    publisher.close()
+
+
+def test_detecting_updates():
+    publisher = TileMapPublisher(get_sample_map())
+    attacher = TileMapAttacher(publisher.get_name())
+    tile_map = attacher.get_tile_map()
+    assert not attacher.has_changed()
+    updated = get_sample_map()
+    updated.get_map()[0, 0] = 1
+    publisher.update(updated)
+    assert attacher.has_changed()
+    assert tile_map.get_map()[0, 0] == 1
+    del tile_map
+    attacher.close()
+    with pytest.raises(ValueError):
+        publisher.update(TileMap(2, 2, updated.get_tiles()))
+    publisher.close()
+
+
+def test_attaching_from_other_process():
+    publisher = TileMapPublisher(get_sample_map())
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        total, names = pool.submit(
+            sum_shared_map, publisher.get_name()).result()
+    assert total == 6
+    assert names == ['0', '1']
+    publisher.close()
+
+
+def test_timeout_on_unfinished_update():
+    publisher = TileMapPublisher(get_sample_map())
+    attacher = TileMapAttacher(publisher.get_name(), timeout=0.05)
+    # simulates publisher that died while writing
+    publisher._write_header(publisher.get_version() + 1, 0)
+    with pytest.raises(TimeoutError):
+        attacher.get_tile_map()
+    attacher.close()
+    publisher.close()
@@ -0,0 +1,47 @@
+import os
+
+import numpy as np
+from PIL import Image
+
+from src.generator import TileMapGenerator
+from src.tile import Tile, TileTreeNode
+from src.tile_map import TileMap
+from src.timelapse import TimelapseEncoder
+from src.visualisation import TileMapVisualisation
+
+
+def get_sample_map():
+    tiles = TileTreeNode(Tile(0, '0', 'blue'), [
+        TileTreeNode(Tile(1, '1', 'green', 0.4, 2), [
+            TileTreeNode(Tile(2, '2', 'red', 0.2, 1))])])
+    return TileMap(20, 25, tiles)
+
+
+def test_numbered_frames(tmp_path):
+    tile_map = get_sample_map()
+    saved = TimelapseEncoder.generate_frames(tile_map, str(tmp_path), 4,
+                                             delta_batch=40, tile_size=2)
+    names = sorted(os.listdir(tmp_path))
+    assert len(names) == saved > 2
+    last = Image.open(os.path.join(tmp_path, names[-1])).convert('RGB')
+    expected = TileMapVisualisation.get_map_image(tile_map, 2)
+    assert np.all(np.array(last) == np.array(expected))
+
+
+def test_encoder_reuses_single_map():
+    tile_map = get_sample_map()
+    encoder = TimelapseEncoder(tile_map, 1)
+    buffer = encoder.get_tile_map().get_map()
+    TileMapGenerator(1).generate_map(tile_map, encoder.apply_delta, 30)
+    assert encoder.get_tile_map().get_map() is buffer
+    assert np.all(buffer == tile_map.get_map())
+
+
+def test_animation(tmp_path):
+    tile_map = get_sample_map()
+    encoder = TimelapseEncoder(tile_map, 2)
+    path = str(tmp_path / 'growth.gif')
+    encoder.save_animation(
+        TileMapGenerator(1).iter_deltas(tile_map, 100), path)
+    with Image.open(path) as animation:
+        assert animation.n_frames == encoder.get_frame_count()
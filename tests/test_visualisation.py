@@ -0,0 +1,95 @@
+import numpy as np
+
+from src.tile import Tile, TileTreeNode
+from src.tile_map import TileMap
+from src.visualisation import TileMapRenderCache, TileMapVisualisation
+
+
+def get_sample_map(color='green'):
+    tiles = TileTreeNode(Tile(0, '0', 'blue'),
+                         [TileTreeNode(Tile(1, '1', color))])
+    tile_map = TileMap(4, 5, tiles)
+    tile_map.get_map()[1:3, 1:3] = 1
+    return tile_map
+
+
+def get_colors(image):
+    return np.asarray(image.convert('RGB'))
+
+
+def test_rendering_tiles():
+    tile_map = get_sample_map()
+    image = TileMapRenderCache(tile_map, 4).get_map_image()
+    colors = get_colors(image)
+    assert image.size == (20, 16)
+    assert colors[0, 0].tolist() == [0, 0, 0]
+    assert colors[1, 1].tolist() == [0, 0, 255]
+    assert colors[6, 6].tolist() == [0, 128, 0]
+
+
+def test_rendering_dirty_region():
+    tile_map = get_sample_map()
+    cache = TileMapRenderCache(tile_map, 4)
+    cache.get_map_image()
+    tile_map.get_map()[3, 4] = 1
+    tile_map.get_map()[0, 0] = 1
+    tile_map.mark_dirty((3, 4, 4, 5))
+    colors = get_colors(cache.get_map_image())
+    assert colors[13, 17].tolist() == [0, 128, 0]
+    # not marked region is not rendered again
+    assert colors[1, 1].tolist() == [0, 0, 255]
+    tile_map.mark_dirty()
+    assert get_colors(cache.get_map_image())[1, 1].tolist() == [0, 128, 0]
+
+
+def test_dirty_region_with_new_id():
+    tile_map = get_sample_map()
+    tile_map.get_map()[...] = 0
+    cache = TileMapRenderCache(tile_map, 4)
+    cache.get_map_image()
+    tile_map.get_map()[2, 2] = 1
+    tile_map.mark_dirty((2, 2, 3, 3))
+    colors = get_colors(cache.get_map_image())
+    assert colors[10, 10].tolist() == [0, 128, 0]
+
+
+def test_changing_colors_only_swaps_palette():
+    tile_map = get_sample_map()
+    cache = TileMapRenderCache(tile_map, 4)
+    image = cache.get_map_image()
+    pixels = np.asarray(image).copy()
+    tile_map.update_tiles(get_sample_map('red').get_tiles())
+    new_image = cache.get_map_image()
+    assert new_image is image
+    assert np.all(np.asarray(new_image) == pixels)
+    assert get_colors(new_image)[6, 6].tolist() == [255, 0, 0]
+
+
+def test_missing_tile_color():
+    tile_map = get_sample_map()
+    tile_map.get_map()[0, 0] = 7
+    colors = get_colors(TileMapRenderCache(tile_map, 4).get_map_image())
+    assert colors[1, 1].tolist() == [255, 255, 255]
+
+
+def test_rendering_more_ids_than_palette_slots():
+    tiles = TileTreeNode(Tile(0, '0', 'blue'),
+                         [TileTreeNode(Tile(1, '1', 'green'))])
+    tile_map = TileMap(20, 20, tiles)
+    tile_map.update_map(np.arange(400).reshape(20, 20))
+    cache = TileMapRenderCache(tile_map, 2)
+    colors = get_colors(cache.get_map_image())
+    assert colors[1, 1].tolist() == [0, 0, 255]
+    assert colors[1, 3].tolist() == [0, 128, 0]
+    assert colors[1, 5].tolist() == [255, 255, 255]
+    assert colors[0, 0].tolist() == [0, 0, 0]
+    tile_map.update_tiles(TileTreeNode(Tile(0, '0', 'red')))
+    colors = get_colors(cache.get_map_image())
+    assert colors[1, 1].tolist() == [255, 0, 0]
+    assert colors[1, 3].tolist() == [255, 255, 255]
+
+
+def test_map_image_is_rgb():
+    image = TileMapVisualisation.get_map_image(get_sample_map(), 4)
+    assert image.mode == 'RGB'
+    assert image.getpixel((6, 6)) == (0, 128, 0)